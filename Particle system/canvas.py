@@ -1,9 +1,36 @@
 import wx
+from time import perf_counter
 import matplotlib
 matplotlib.use('WXAgg')
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 
+from counters import RollingCounter
+
+
+class _FrameCanvas(FigureCanvas):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.render_time = RollingCounter()
+        self._frame_start = None
+
+    def start_frame(self):
+        self._frame_start = perf_counter()
+
+    def draw(self, drawDC=None):
+        start_time = perf_counter()
+        super().draw(drawDC)
+        self._finish_frame(start_time)
+
+    def blit(self, bbox=None):
+        super().blit(bbox)
+        self._finish_frame(self._frame_start)
+
+    def _finish_frame(self, start_time):
+        if self._frame_start is not None:
+            self.render_time.add(perf_counter() - start_time)
+            self._frame_start = None
+
 
 class CanvasPanel(wx.Panel):
     def __init__(self, parent):
@@ -13,13 +40,20 @@ class CanvasPanel(wx.Panel):
         self._axes = self.figure.add_axes([0, 0, 1, 1])
         self._axes.set(xlim=(0, 1), ylim=(0, 1))
         self._scat = self._axes.scatter(x=[], y=[])
-        self._canvas = FigureCanvas(self, id=-1, figure=self.figure)
+        self._canvas = _FrameCanvas(self, id=-1, figure=self.figure)
         self.figure.set_canvas(self._canvas)
         box_sizer = wx.BoxSizer(wx.VERTICAL)
         box_sizer.Add(self._canvas, flag=wx.EXPAND | wx.TOP, border=6)
         self.SetSizer(box_sizer)
         self.Fit()
 
+    @property
+    def render_time(self):
+        return self._canvas.render_time
+
+    def start_frame(self):
+        self._canvas.start_frame()
+
     def draw_markers(self, marker_positions, marker_sizes, marker_colors):
         self._scat.set_offsets(marker_positions)
         self._scat.set_sizes(marker_sizes)
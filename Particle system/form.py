@@ -1,17 +1,24 @@
 import wx
 import numpy as np
+from time import time, perf_counter
 from wx.lib.masked import NumCtrl
 from matplotlib.animation import FuncAnimation
 
 from emitter import Emitter
 from loading import load_data
 from canvas import CanvasPanel
-from gravity_simulation import calculate_system_motion
+from counters import RollingCounter, RateCounter
+from gravity_simulation import calculate_dense_motion
+
+FPS = 25
+STEPS_PER_SECOND = 2
+HUD_FIELDS = (-2, -1, -1, -1, -2, -1)
 
 
 class Form(wx.Frame):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, debug=False, **kwargs):
         super().__init__(*args, **kwargs)
+        self._debug = debug
         self._panel = wx.Panel(self)
         self._panel_sizer = wx.GridBagSizer()
         self._widgets = {}
@@ -21,6 +28,9 @@ class Form(wx.Frame):
         value = 1
         self._is_calculated = False
         self._is_solar_mode = False
+        self._motion = None
+        self._motion_time = 0.0
+        self._last_frame_time = None
         self._emitter = Emitter([value, value], [value, value])
 
         self._init_emitter_block(ctrl_size, value)
@@ -29,10 +39,19 @@ class Form(wx.Frame):
         self._init_operations_block()
         self._init_canvas_block()
 
+        status_bar = self.CreateStatusBar(len(HUD_FIELDS))
+        status_bar.SetStatusWidths(list(HUD_FIELDS))
+        self._frame_time = RollingCounter()
+        self._step_time = RollingCounter()
+        self._particle_steps = RateCounter()
+        self._last_callback_time = None
+        self._drawn_frames = 0
+
         self._panel.SetSizer(self._panel_sizer)
         self._panel_sizer.Fit(self)
         self.Show()
-        self.animation = FuncAnimation(self._canvas.figure, self._update_canvas, interval=500)
+        self.animation = FuncAnimation(self._canvas.figure, self._update_canvas,
+                                       interval=1000 // FPS)
 
     def _init_emitter_block(self, ctrl_size, value):
         static_box = wx.StaticBox(self._panel, label="Emitter")
@@ -200,6 +219,7 @@ class Form(wx.Frame):
         value = widget.GetValue()
         self._emitter.generate_particles(value)
         self._max_coord = self._emitter.max_coord
+        self._motion = None
         self._is_calculated = True
 
     def _on_single_particle_generation_click(self, event):
@@ -215,30 +235,76 @@ class Form(wx.Frame):
         self._emitter.create_particle(speed=[u_speed, v_speed], mass=mass,
                                       color=color, life_time=life_time)
         self._max_coord = self._emitter.max_coord
+        self._motion = None
         self._is_calculated = True
 
     def _update_canvas(self, frame):
+        callback_time = perf_counter()
+        if self._last_callback_time is not None:
+            self._frame_time.add(callback_time - self._last_callback_time)
+        self._last_callback_time = callback_time
+        self._canvas.start_frame()
+        self._drawn_frames += 1
+        if self._drawn_frames % FPS == 0:
+            self._update_hud()
+        self._draw_frame()
+
+    def _draw_frame(self):
         if not self._is_calculated:
+            self._last_frame_time = None
             return
 
-        if not self._emitter.particles:
+        now = time()
+        if self._motion is None:
+            self._advance_motion()
+        elif self._last_frame_time is not None:
+            elapsed = now - self._last_frame_time
+            self._motion_time += elapsed * STEPS_PER_SECOND * self._motion.duration
+            if self._motion_time >= self._motion.duration:
+                self._motion_time = min(self._motion_time - self._motion.duration,
+                                        self._motion.duration)
+                self._advance_motion()
+        self._last_frame_time = now
+
+        particles = self._motion.particles
+        if not particles:
             self._canvas.clear()
             self._is_calculated = False
+            self._motion = None
             return
 
-        particles = self._emitter.particles
-        marker_positions = [np.array(p.coordinates) / self._max_coord for p in particles]
+        marker_positions = self._motion.positions(self._motion_time) / self._max_coord
         if self._is_solar_mode:
-            marker_positions = [np.array(p) / 2.1 + 0.5 for p in marker_positions]
+            marker_positions = marker_positions / 2.1 + 0.5
         marker_sizes = [p.radius for p in particles]
         marker_colors = [[c / 255 for c in p.color] for p in particles]
         self._canvas.draw_markers(marker_positions,
                                   marker_sizes, marker_colors)
 
-        print(self._emitter)
+    def _advance_motion(self):
+        if self._debug:
+            print(self._emitter)
         delta_t = 10 ** 6 if self._is_solar_mode else 1
         method_name = self._widgets['method'].GetValue()
-        self._emitter.particles = calculate_system_motion(particles, delta_t, method_name)
+        particles_count = len(self._emitter.particles)
+        start_time = perf_counter()
+        self._motion = calculate_dense_motion(self._emitter.particles, delta_t, method_name)
+        self._step_time.add(perf_counter() - start_time)
+        self._particle_steps.add(particles_count)
+        self._emitter.particles = self._motion.particles
+
+    def _update_hud(self):
+        frame_time = self._frame_time.mean
+        fps = 1 / frame_time if frame_time else 0.0
+        particles_count = len(self._motion.particles) if self._motion is not None else 0
+        fields = [f'frame {1000 * frame_time:.1f} ms ({fps:.1f} fps)',
+                  f'render {1000 * self._canvas.render_time.mean:.1f} ms',
+                  f'step {1000 * self._step_time.mean:.1f} ms',
+                  f'{particles_count} particles',
+                  f'{self._particle_steps.rate:.3g} particle-steps/s',
+                  self._widgets['method'].GetValue()]
+        for i, text in enumerate(fields):
+            self.SetStatusText(text, i)
 
     def _on_loading_click(self, event):
         self._clear()
@@ -260,6 +326,8 @@ class Form(wx.Frame):
 
     def _clear(self):
         self._emitter.particles = []
+        self._motion = None
+        self._motion_time = 0.0
         self._canvas.clear()
 
     def _on_clear_click(self, event):
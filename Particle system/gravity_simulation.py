@@ -1,5 +1,19 @@
 import numpy as np
-from scipy.integrate import odeint
+from scipy.integrate import solve_ivp
+
+RTOL = 1.49012e-8
+ATOL = 1.49012e-8
+
+
+class Motion:
+    def __init__(self, particles, duration, interpolant):
+        self.particles = particles
+        self.duration = duration
+        self._interpolant = interpolant
+
+    def positions(self, time):
+        time = min(max(time, 0), self.duration)
+        return self._interpolant(time)
 
 
 def _calculate_acceleration(particles, index):
@@ -14,47 +28,95 @@ def _calculate_acceleration(particles, index):
     return acceleration
 
 
-def _calculate_derivatives(initial, t, particles, index):
-    x_coord, y_coord, u_speed, v_speed = initial
-    particles[index].coordinates = [x_coord, y_coord]
-    acc_x, acc_y = _calculate_acceleration(particles, index)
-    return [u_speed, v_speed, acc_x, acc_y]
+def _calculate_system_derivatives(t, state, masses, radii):
+    G = 6.6743015 * (10 ** -11)
+    state = state.reshape(-1, 4)
+    dx = state[np.newaxis, :, 0] - state[:, np.newaxis, 0]
+    dy = state[np.newaxis, :, 1] - state[:, np.newaxis, 1]
+    dist = np.sqrt(dx * dx + dy * dy)
+    apart = dist > radii[np.newaxis, :] + radii[:, np.newaxis]
+    np.fill_diagonal(apart, False)
+    factor = np.divide(G * masses[np.newaxis, :], dist ** 3,
+                       out=np.zeros_like(dist), where=apart)
+
+    result = np.empty_like(state)
+    result[:, :2] = state[:, 2:]
+    result[:, 2] = np.sum(factor * dx, axis=1)
+    result[:, 3] = np.sum(factor * dy, axis=1)
+    return result.ravel()
 
 
 def calculate_system_motion(particles, delta_t, method_name):
+    return calculate_dense_motion(particles, delta_t, method_name).particles
+
+
+def calculate_dense_motion(particles, delta_t, method_name):
     if not particles:
-        return []
+        return Motion([], delta_t, lambda t: np.zeros((0, 2)))
 
     if len(particles) == 1:
         if particles[0].life_time == 0:
             particles.clear()
-        else:
-            p = particles[0]
-            p.coordinates += np.array(p.speed)
-            particles[0].life_time -= 1
-        return particles
+            return Motion(particles, delta_t, lambda t: np.zeros((0, 2)))
+        p = particles[0]
+        start = np.array(p.coordinates, dtype=float)
+        p.coordinates = start + np.array(p.speed)
+        p.life_time -= 1
+        end = np.array(p.coordinates, dtype=float)
+        return Motion(particles, delta_t,
+                      lambda t: (start + (end - start) * t / delta_t)[np.newaxis])
 
     particles = [p for p in particles if p.life_time > 0]
+    if not particles:
+        return Motion([], delta_t, lambda t: np.zeros((0, 2)))
+    if method_name == 'Verlet':
+        interpolant = _calculate_verlet_motion(particles, delta_t)
+    else:
+        interpolant = _calculate_odeint_motion(particles, delta_t)
+    for p in particles:
+        p.life_time -= 1
+    return Motion(particles, delta_t, interpolant)
+
+
+def _calculate_odeint_motion(particles, delta_t):
+    state = _get_state(particles)
+    masses = np.array([p.mass for p in particles], dtype=float)
+    radii = np.array([p.radius for p in particles], dtype=float)
+    solution = solve_ivp(_calculate_system_derivatives, (0, delta_t), state.ravel(),
+                         method='LSODA', rtol=RTOL, atol=ATOL, dense_output=True,
+                         args=(masses, radii))
+    _set_state(particles, solution.y[:, -1].reshape(-1, 4))
+    return lambda t: solution.sol(t).reshape(-1, 4)[:, :2]
+
+
+def _calculate_verlet_motion(particles, delta_t):
+    start = _get_state(particles)
     prev_particles = particles.copy()
+    for i in range(len(particles)):
+        _calculate_verlet(particles, prev_particles, i, delta_t)
+    end = _get_state(particles)
+    return lambda t: _interpolate_hermite(start, end, t, delta_t)
 
-    for i, p in enumerate(particles):
-        if method_name == 'Verlet':
-            _calculate_verlet(particles, prev_particles, i, delta_t)
-        else:
-            _calculate_odeint(particles, i, delta_t)
-        p.life_time -= 1
-    return particles
-
-
-def _calculate_odeint(particles, index, delta_t):
-    p = particles[index]
-    y_init = [p.coordinates[0], p.coordinates[1],
-              p.speed[0], p.speed[1]]
-    solution = odeint(func=_calculate_derivatives, y0=y_init,
-                      t=np.linspace(0, delta_t, 2), args=(particles, index))
-    x_coord, y_coord, u_speed, v_speed = solution[-1]
-    p.coordinates = [x_coord, y_coord]
-    p.speed = [u_speed, v_speed]
+
+def _interpolate_hermite(start, end, t, delta_t):
+    s = t / delta_t
+    h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+    h10 = s ** 3 - 2 * s ** 2 + s
+    h01 = -2 * s ** 3 + 3 * s ** 2
+    h11 = s ** 3 - s ** 2
+    return (h00 * start[:, :2] + h10 * delta_t * start[:, 2:]
+            + h01 * end[:, :2] + h11 * delta_t * end[:, 2:])
+
+
+def _get_state(particles):
+    return np.array([[p.coordinates[0], p.coordinates[1], p.speed[0], p.speed[1]]
+                     for p in particles], dtype=float)
+
+
+def _set_state(particles, state):
+    for p, (x_coord, y_coord, u_speed, v_speed) in zip(particles, state):
+        p.coordinates = np.array([x_coord, y_coord])
+        p.speed = np.array([u_speed, v_speed])
 
 
 def _calculate_verlet(upd_particles, prev_particles, index, delta_t):
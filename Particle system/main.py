@@ -1,8 +1,18 @@
 import wx
+import argparse
 from form import Form
 
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Particle system viewer')
+    parser.add_argument('--debug', action='store_true',
+                        help='print the emitter state on every simulation step')
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = _parse_args()
     app = wx.App()
-    form = Form(parent=None, id=-1, title="Particle system")
+    form = Form(parent=None, id=-1, title="Particle system", debug=args.debug)
     app.SetTopWindow(form)
     app.MainLoop()
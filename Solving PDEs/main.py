@@ -1,11 +1,18 @@
 import imageio
 import numpy as np
+from time import perf_counter
 from fenics import *
-from mshr import Circle, generate_mesh
 from matplotlib import tri, pyplot as plt
 from sympy import symbols, diff, sqrt, ccode, sin, cos, exp
 
+from mesh_cache import get_function_space
+from rendering import FrameRenderer, draw_solutions
+
 x, y, t = symbols('x[0], x[1], t')
+RADIUS = 1
+RESOLUTION = 30
+
+_plot_caches = {}
 
 
 def calculate_laplacian(u):
@@ -27,40 +34,61 @@ def check_boundary(x, on_check_boundary):
     return on_check_boundary and x[1] < 0
 
 
-def solve_poisson_equation(u_e, alpha, title_name):
-    domain = Circle(Point(0, 0), 1)
-    mesh = generate_mesh(domain, 30)
-    V = FunctionSpace(mesh, 'P', 2)
+def solve_poisson_equation(u_e, alpha, title_name=None, resolution=RESOLUTION):
+    title_names = None if title_name is None else [title_name]
+    return solve_poisson_equations([u_e], alpha, title_names, resolution)[0]
 
-    u_d = Expression(ccode(u_e), degree=2)
-    bc = DirichletBC(V, u_d, check_boundary)
+
+def solve_poisson_equations(u_es, alpha, title_names=None, resolution=RESOLUTION):
+    V = get_function_space(RADIUS, resolution, 'P', 2)
+    mesh = V.mesh()
     u = TrialFunction(V)
     v = TestFunction(V)
 
-    f = -calculate_laplacian(u_e) + alpha * u_e
-    f = Expression(ccode(f), degree=2)
-    g = calculate_normal_derivative(u_e)
-    g = Expression(ccode(g), degree=2)
-
+    start_time = perf_counter()
     a = dot(grad(u), grad(v)) * dx + alpha * u * v * dx
-    L = f * v * dx + g * v * ds
-    u = Function(V)
-    solve(a == L, u, bc)
+    A = assemble(a)
+    DirichletBC(V, Constant(0), check_boundary).apply(A)
+    solver = LUSolver(A)
+    setup_time = perf_counter() - start_time
+
+    b = None
+    errors = []
+    solve_times = []
+    for i, u_e in enumerate(u_es):
+        start_time = perf_counter()
+        u_d = Expression(ccode(u_e), degree=2)
+        f = -calculate_laplacian(u_e) + alpha * u_e
+        f = Expression(ccode(f), degree=2)
+        g = calculate_normal_derivative(u_e)
+        g = Expression(ccode(g), degree=2)
+
+        L = f * v * dx + g * v * ds
+        b = assemble(L, tensor=b)
+        DirichletBC(V, u_d, check_boundary).apply(b)
+        u = Function(V)
+        solver.solve(u.vector(), b)
+        solve_times.append(perf_counter() - start_time)
+
+        u_e = u_d
+        error_L2 = errornorm(u_e, u, 'L2')
+        vertex_values_u = u.compute_vertex_values(mesh)
+        vertex_values_u_e = u_e.compute_vertex_values(mesh)
+        error_max = np.max(np.abs(vertex_values_u_e - vertex_values_u))
+        print('Max error = %.3g, L2 error = %.3g' % (error_max, error_L2))
+        errors.append((error_max, error_L2))
+        if title_names is not None:
+            image = plot_solutions(u_e, u, mesh)
+            imageio.imsave(f'poisson_{title_names[i]}.png', image)
 
-    u_e = u_d
-    error_L2 = errornorm(u_e, u, 'L2')
-    vertex_values_u = u.compute_vertex_values(mesh)
-    vertex_values_u_e = u_e.compute_vertex_values(mesh)
-    error_max = np.max(np.abs(vertex_values_u_e - vertex_values_u))
-    print('Max error = %.3g, L2 error = %.3g' % (error_max, error_L2))
-    image = plot_solutions(u_e, u, mesh)
-    imageio.imsave(f'poisson_{title_name}.png', image)
+    print('Assembly and factorization %.3g s, %d right-hand sides: %.3g s per solve'
+          % (setup_time, len(u_es), np.mean(solve_times)))
+    return errors
 
 
-def solve_heat_equation(u_e, steps_number, alpha, title_name):
-    domain = Circle(Point(0, 0), 1)
-    mesh = generate_mesh(domain, 30)
-    V = FunctionSpace(mesh, 'P', 2)
+def solve_heat_equation(u_e, steps_number, alpha, title_name=None, resolution=RESOLUTION):
+    V = get_function_space(RADIUS, resolution, 'P', 2)
+    mesh = V.mesh()
 
     u_d = Expression(ccode(u_e), t=0, degree=2)
     bc = DirichletBC(V, u_d, check_boundary)
@@ -78,75 +106,93 @@ def solve_heat_equation(u_e, steps_number, alpha, title_name):
     dt = T / steps_number
     a = u * v * dx + dt * dot(grad(u), grad(v)) * dx
     L = (u_n + dt * f) * v * dx + dt * v * g * ds
+
+    start_time = perf_counter()
+    A = assemble(a)
+    bc.apply(A)
+    solver = LUSolver(A)
+    setup_time = perf_counter() - start_time
+
     u = Function(V)
+    b = None
     t = 0
-    plots = []
+    renderer = None
+    if title_name is not None:
+        renderer = FrameRenderer(mesh.coordinates(), mesh.cells(), f'heat_{title_name}.avi')
     errors_L2 = []
     errors_max = []
-
-    for n in range(steps_number):
-        t += dt
-        u_d.t = t
-        g.t = t
-        f.t = t
-        solve(a == L, u, bc)
-        u_n.assign(u)
-        u_e = interpolate(u_d, V)
-        error_L2 = errornorm(u_e, u, 'L2')
-        error_max = np.abs(u_e.vector().get_local() - u.vector().get_local()).max()
-        print('t = %.2f: max error = %.3g, L2 error = %.3g' % (t, error_max, error_L2))
-        plots.append(plot_solutions(u_e, u, mesh))
-        errors_max.append(error_max)
-        errors_L2.append(error_L2)
-
-    imageio.imsave(f'heat_{title_name}.png', plots[-1])
-    write_video(plots, f'heat_{title_name}')
+    step_times = []
+
+    try:
+        for n in range(steps_number):
+            start_time = perf_counter()
+            t += dt
+            u_d.t = t
+            g.t = t
+            f.t = t
+            b = assemble(L, tensor=b)
+            bc.apply(b)
+            solver.solve(u.vector(), b)
+            u_n.assign(u)
+            step_times.append(perf_counter() - start_time)
+            u_e = interpolate(u_d, V)
+            error_L2 = errornorm(u_e, u, 'L2')
+            error_max = np.abs(u_e.vector().get_local() - u.vector().get_local()).max()
+            print('t = %.2f: max error = %.3g, L2 error = %.3g' % (t, error_max, error_L2))
+            if renderer is not None:
+                renderer.submit(*sample_solutions(u_e, u, mesh))
+            errors_max.append(error_max)
+            errors_L2.append(error_L2)
+    finally:
+        if renderer is not None:
+            renderer.close()
+
+    print('Assembly and factorization %.3g s, %d steps: %.3g s per step, %.3g s total'
+          % (setup_time, steps_number, np.mean(step_times), setup_time + np.sum(step_times)))
+    if renderer is None:
+        return errors_max, errors_L2
+
+    imageio.imsave(f'heat_{title_name}.png', renderer.last_frame)
     time_interval = np.linspace(dt, T, steps_number)
     plt.plot(time_interval, errors_max, label='Max error')
     plt.plot(time_interval, errors_L2, label='L2 error')
     plt.legend()
     plt.savefig(f'errors_{title_name}.png')
     plt.close()
+    return errors_max, errors_L2
+
 
+def plot_solutions(u_e, u, mesh):
+    triangulation = _get_plot_cache(mesh)[0]
+    return draw_solutions(triangulation, *sample_solutions(u_e, u, mesh))
 
-def write_video(images, title_name, fps=10):
-    with imageio.get_writer(f'{title_name}.avi', fps=fps) as writer:
-        for image in images:
-            writer.append_data(image)
 
+def sample_solutions(u_e, u, mesh):
+    triangulation, faces, cell_dofs = _get_plot_cache(mesh)
+    faces.interpolate(u_e)
+    exact_faces = faces.vector().get_local()[cell_dofs]
+    faces.interpolate(u)
+    approx_faces = faces.vector().get_local()[cell_dofs]
+    return exact_faces, approx_faces
 
-def plot_solutions(u_e, u, mesh):
-    n = mesh.num_vertices()
-    d = mesh.geometry().dim()
-    mesh_coordinates = mesh.coordinates().reshape((n, d))
-    triangles = np.asarray([cell.entities(0) for cell in cells(mesh)])
-    triangulation = tri.Triangulation(mesh_coordinates[:, 0],
-                                      mesh_coordinates[:, 1], triangles)
-
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(11, 4))
-    z_faces = np.asarray([u_e(cell.midpoint()) for cell in cells(mesh)])
-    ax1_plot = ax1.tripcolor(triangulation, facecolors=z_faces, edgecolors='k')
-    z_faces = np.asarray([u(cell.midpoint()) for cell in cells(mesh)])
-    ax2_plot = ax2.tripcolor(triangulation, facecolors=z_faces, edgecolors='k')
-    
-    ax1.set_title('Real solution')
-    ax2.set_title('Approximate solution')
-    fig.colorbar(ax1_plot, ax=ax1)
-    fig.colorbar(ax2_plot, ax=ax2)
-    fig.canvas.draw()
-    fig_plot = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
-    fig_plot = fig_plot.reshape(fig.canvas.get_width_height()[::-1] + (3,))
-    plt.close()
-    return fig_plot
+
+def _get_plot_cache(mesh):
+    if mesh.id() not in _plot_caches:
+        coordinates = mesh.coordinates()
+        triangulation = tri.Triangulation(coordinates[:, 0], coordinates[:, 1], mesh.cells())
+        W = FunctionSpace(mesh, 'DG', 0)
+        dofmap = W.dofmap()
+        cell_dofs = np.array([dofmap.cell_dofs(i)[0] for i in range(mesh.num_cells())])
+        _plot_caches[mesh.id()] = triangulation, Function(W), cell_dofs
+    return _plot_caches[mesh.id()]
 
 
 def main():
     set_log_active(False)
 
     alpha = 1
-    solve_poisson_equation(1 - x ** 2 + y, alpha, 'func1')
-    solve_poisson_equation(sin(x) * y + x * cos(y), alpha, 'func2')
-    solve_poisson_equation(sin(y ** 2) - x * exp(y), alpha, 'func3')
+    solve_poisson_equations([1 - x ** 2 + y, sin(x) * y + x * cos(y),
+                             sin(y ** 2) - x * exp(y)], alpha, ['func1', 'func2', 'func3'])
 
     steps_number = 50
     solve_heat_equation(t * (y - x * t), steps_number, alpha, 'func1')
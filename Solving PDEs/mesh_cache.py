@@ -0,0 +1,61 @@
+import os
+import shutil
+from fenics import FunctionSpace, Mesh, MPI, Point, XDMFFile
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ctmm', 'meshes')
+MESH_FILE = 'mesh.xdmf'
+
+_meshes = {}
+_spaces = {}
+
+
+def get_function_space(radius=1, resolution=30, family='P', degree=2, directory=CACHE_DIR):
+    key = (radius, resolution, family, degree)
+    if key not in _spaces:
+        mesh = get_circle_mesh(radius, resolution, directory)
+        _spaces[key] = FunctionSpace(mesh, family, degree)
+    return _spaces[key]
+
+
+def get_circle_mesh(radius=1, resolution=30, directory=CACHE_DIR):
+    key = (radius, resolution)
+    if key not in _meshes:
+        path = os.path.join(directory, f'circle_{radius}_{resolution}', MESH_FILE)
+        if os.path.exists(path):
+            mesh = _read_mesh(path)
+        else:
+            mesh = _generate_circle_mesh(radius, resolution)
+            _write_mesh(mesh, os.path.dirname(path))
+        _meshes[key] = mesh
+    return _meshes[key]
+
+
+def clear_mesh_cache(directory=CACHE_DIR):
+    _spaces.clear()
+    _meshes.clear()
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+
+
+def _generate_circle_mesh(radius, resolution):
+    from mshr import Circle, generate_mesh
+
+    return generate_mesh(Circle(Point(0, 0), radius), resolution)
+
+
+def _read_mesh(path):
+    mesh = Mesh()
+    with XDMFFile(MPI.comm_world, path) as mesh_file:
+        mesh_file.read(mesh)
+    return mesh
+
+
+def _write_mesh(mesh, directory):
+    temp_dir = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(temp_dir, exist_ok=True)
+    with XDMFFile(MPI.comm_world, os.path.join(temp_dir, MESH_FILE)) as mesh_file:
+        mesh_file.write(mesh)
+    try:
+        os.replace(temp_dir, directory)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
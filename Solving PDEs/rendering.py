@@ -0,0 +1,75 @@
+import os
+import imageio
+import numpy as np
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib import tri
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+WORKERS = 2
+
+_triangulation = None
+
+
+class FrameRenderer:
+    def __init__(self, coordinates, triangles, file_name, fps=10, workers=None, window=None):
+        workers = workers or min(WORKERS, os.cpu_count() or 1)
+        self.window = window or 2 * workers
+        self.last_frame = None
+        self._frames = deque()
+        self._writer = imageio.get_writer(file_name, fps=fps)
+        self._executor = ProcessPoolExecutor(workers, mp.get_context('spawn'),
+                                             _init_renderer, (coordinates, triangles))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, exact_faces, approx_faces):
+        self._frames.append(self._executor.submit(_render_frame, exact_faces, approx_faces))
+        while len(self._frames) > self.window:
+            self._write(self._frames.popleft())
+
+    def close(self):
+        try:
+            while self._frames:
+                self._write(self._frames.popleft())
+        finally:
+            for frame in self._frames:
+                frame.cancel()
+            self._frames.clear()
+            self._executor.shutdown()
+            self._writer.close()
+        return self.last_frame
+
+    def _write(self, frame):
+        self.last_frame = frame.result()
+        self._writer.append_data(self.last_frame)
+
+
+def draw_solutions(triangulation, exact_faces, approx_faces):
+    fig = Figure(figsize=(11, 4))
+    canvas = FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(1, 2)
+    ax1_plot = ax1.tripcolor(triangulation, facecolors=exact_faces, edgecolors='k')
+    ax2_plot = ax2.tripcolor(triangulation, facecolors=approx_faces, edgecolors='k')
+
+    ax1.set_title('Real solution')
+    ax2.set_title('Approximate solution')
+    fig.colorbar(ax1_plot, ax=ax1)
+    fig.colorbar(ax2_plot, ax=ax2)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+
+
+def _init_renderer(coordinates, triangles):
+    global _triangulation
+    _triangulation = tri.Triangulation(coordinates[:, 0], coordinates[:, 1], triangles)
+
+
+def _render_frame(exact_faces, approx_faces):
+    return draw_solutions(_triangulation, exact_faces, approx_faces)
@@ -0,0 +1,121 @@
+import os
+import json
+import argparse
+import itertools
+import traceback
+import multiprocessing as mp
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+
+from fenics import set_log_active
+from sympy import sympify
+
+from main import x, y, t, solve_poisson_equation, solve_heat_equation
+
+POISSON_EXPRESSIONS = ('1 - x**2 + y', 'sin(x)*y + x*cos(y)', 'sin(y**2) - x*exp(y)')
+HEAT_EXPRESSIONS = ('t*(y - x*t)', 'x**2*t - cos(y*t)', 'x*cos(t**2) + t*sin(y)')
+SUMMARY_FILE = 'summary.json'
+
+
+def build_jobs(problems, expressions, alphas, resolutions, steps):
+    jobs = []
+    for problem in problems:
+        problem_expressions = expressions or (POISSON_EXPRESSIONS if problem == 'poisson'
+                                              else HEAT_EXPRESSIONS)
+        problem_steps = steps if problem == 'heat' else [None]
+        for expression, alpha, resolution, steps_number in itertools.product(
+                problem_expressions, alphas, resolutions, problem_steps):
+            jobs.append({'id': len(jobs), 'problem': problem, 'expression': expression,
+                         'alpha': alpha, 'resolution': resolution, 'steps': steps_number})
+    return jobs
+
+
+def run_job(job, output_dir):
+    set_log_active(False)
+    u_e = sympify(job['expression'], locals={'x': x, 'y': y, 't': t})
+    record = dict(job, pid=os.getpid())
+    start_time = perf_counter()
+    try:
+        if job['problem'] == 'poisson':
+            error_max, error_L2 = solve_poisson_equation(u_e, job['alpha'],
+                                                         resolution=job['resolution'])
+            record.update(error_max=error_max, error_L2=error_L2)
+        else:
+            errors_max, errors_L2 = solve_heat_equation(u_e, job['steps'], job['alpha'],
+                                                        resolution=job['resolution'])
+            record.update(error_max=max(errors_max), error_L2=max(errors_L2),
+                          final_error_max=errors_max[-1], final_error_L2=errors_L2[-1])
+        record['status'] = 'ok'
+    except Exception:
+        record.update(status='failed', error=traceback.format_exc())
+    record['runtime'] = perf_counter() - start_time
+
+    record = {key: float(value) if hasattr(value, 'dtype') else value
+              for key, value in record.items()}
+    with open(os.path.join(output_dir, f"job_{job['id']:04d}.json"), 'w') as manifest:
+        json.dump(record, manifest, indent=2)
+    return record
+
+
+def run_sweep(jobs, output_dir, workers=None):
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = perf_counter()
+    records = []
+    with ProcessPoolExecutor(workers, mp.get_context('spawn')) as executor:
+        futures = [executor.submit(run_job, job, output_dir) for job in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            _print_record(record)
+            records.append(record)
+
+    records.sort(key=lambda record: record['id'])
+    summary = {'jobs': len(records),
+               'failed': sum(record['status'] != 'ok' for record in records),
+               'runtime': perf_counter() - start_time,
+               'results': records}
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+def _print_record(record):
+    config = (f"{record['problem']} {record['expression']!r} alpha={record['alpha']} "
+              f"resolution={record['resolution']}")
+    if record['steps'] is not None:
+        config += f" steps={record['steps']}"
+    if record['status'] != 'ok':
+        print(f'{config}: failed after {record["runtime"]:.2f} s')
+        return
+    print(f"{config}: max error {record['error_max']:.3g}, "
+          f"L2 error {record['error_L2']:.3g}, {record['runtime']:.2f} s")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Run Poisson and heat equation sweeps headless')
+    parser.add_argument('--problems', nargs='+', choices=('poisson', 'heat'),
+                        default=['poisson', 'heat'])
+    parser.add_argument('--expressions', nargs='+', default=None,
+                        help='manufactured solutions in x, y and t, default per problem')
+    parser.add_argument('--alphas', nargs='+', type=float, default=[1.0])
+    parser.add_argument('--resolutions', nargs='+', type=int, default=[30])
+    parser.add_argument('--steps', nargs='+', type=int, default=[50],
+                        help='time steps of the heat equation runs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output-dir', default='sweep')
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    jobs = build_jobs(args.problems, args.expressions, args.alphas,
+                      args.resolutions, args.steps)
+    summary = run_sweep(jobs, args.output_dir, args.workers)
+    print(f"{summary['jobs']} jobs, {summary['failed']} failed, "
+          f"{summary['runtime']:.2f} s -> {os.path.join(args.output_dir, SUMMARY_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+
+from gravity_simulation import NODES
+
+
+class ParticleArena:
+    def __init__(self, capacity=4096):
+        self.capacity = 0
+        self.data = np.zeros((0, NODES))
+        self.colors = np.zeros((0, 3))
+        self.sizes = np.zeros(0)
+        self.life_time = np.zeros(0, dtype=int)
+        self.alive = np.zeros(0, dtype=bool)
+        self.version = 0
+        self._free = []
+        self._indices = None
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def emit(self, coordinates, speed, mass, radius, color, life_time):
+        if not self._free:
+            self._grow(2 * self.capacity)
+        index = self._free.pop()
+        self.data[index] = (coordinates[0], coordinates[1],
+                            speed[0], speed[1], radius, mass)
+        self.sizes[index] = radius
+        self.colors[index] = np.asarray(tuple(color)[:3], dtype=float) / 255
+        self.life_time[index] = life_time
+        self.alive[index] = True
+        self._changed()
+        return index
+
+    def emit_particle(self, particle):
+        return self.emit(particle.coordinates, particle.speed, particle.mass,
+                         particle.radius, particle.color, particle.life_time)
+
+    def release(self, index):
+        if self.alive[index]:
+            self.alive[index] = False
+            self._free.append(index)
+            self._changed()
+
+    def expire(self):
+        dead = np.flatnonzero(self.alive & (self.life_time <= 0))
+        if len(dead):
+            self.alive[dead] = False
+            self._free.extend(dead.tolist())
+            self._changed()
+        return dead
+
+    def indices(self):
+        if self._indices is None:
+            self._indices = np.flatnonzero(self.alive)
+        return self._indices
+
+    def clear(self):
+        self.alive[:] = False
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self._changed()
+
+    def _changed(self):
+        self._indices = None
+        self.version += 1
+
+    def _grow(self, capacity):
+        old_capacity = self.capacity
+        self.data = np.resize(self.data, (capacity, NODES))
+        self.colors = np.resize(self.colors, (capacity, 3))
+        self.sizes = np.resize(self.sizes, capacity)
+        self.life_time = np.resize(self.life_time, capacity)
+        self.alive = np.resize(self.alive, capacity)
+        self.alive[old_capacity:] = False
+        self._free = list(range(capacity - 1, old_capacity - 1, -1)) + self._free
+        self.capacity = capacity
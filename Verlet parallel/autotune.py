@@ -0,0 +1,147 @@
+import os
+import json
+import platform
+import threading
+import numpy as np
+from time import time
+
+from emitter import Emitter
+from forces import GRAVITY
+from gravity_simulation import calculate_system_motion
+from backends import available_backends, get_backend, probe_capabilities, probe_capability
+
+TABLE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ctmm', 'autotune.json')
+BENCHMARK_TICKS = 3
+BENCHMARK_REPEATS = 2
+BENCHMARK_BUDGET = 2.0
+DEFAULT_METHOD = 'verlet_numpy'
+PYTHON_LOOP_METHODS = ('verlet_sequential', 'verlet_threading', 'verlet_multiprocessing')
+PYTHON_LOOP_LIMIT = 512
+
+_lock = threading.Lock()
+_benchmark_lock = threading.Lock()
+_table = None
+
+
+def calculate_auto(data, max_time, tick_count, force_law=None):
+    method_name, options = select_method(len(data), max_time / tick_count, force_law)
+    method = get_backend(method_name, force_law).bind(force_law=force_law, **options)
+    return method(data, max_time, tick_count)
+
+
+def select_method(particles_count, delta_t, force_law=None):
+    key = _decision_key(particles_count, delta_t, force_law)
+    decision = _lookup_decision(key)
+    if decision is None:
+        with _benchmark_lock:
+            decision = _lookup_decision(key)
+            if decision is None:
+                decision = benchmark_methods(particles_count, delta_t, force_law)
+                with _lock:
+                    table = _load_table()
+                    table['decisions'][key] = decision
+                    _save_table(table)
+    return decision['method'], decision['options']
+
+
+def benchmark_methods(particles_count, delta_t, force_law=None, budget=BENCHMARK_BUDGET):
+    particles = _generate_benchmark_particles(particles_count)
+    max_time = BENCHMARK_TICKS * delta_t
+    deadline = time() + budget
+    timings = []
+
+    for backend in _candidate_backends(particles_count, force_law):
+        for options in _candidate_options(backend):
+            if timings and time() > deadline:
+                break
+            runtime = _time_candidate(backend.name, particles, max_time, deadline,
+                                      force_law=force_law, **options)
+            if runtime is not None:
+                timings.append({'method': backend.name, 'options': options, 'time': runtime})
+
+    if not timings:
+        return {'method': DEFAULT_METHOD, 'options': {}, 'time': None}
+    timings.sort(key=lambda timing: timing['time'])
+    return timings[0]
+
+
+def host_fingerprint():
+    capabilities = probe_capabilities()
+    return {'host': platform.node(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpu_count': capabilities['cpu_count'],
+            'capabilities': sorted(name for name, value in capabilities.items() if value)}
+
+
+def _lookup_decision(key):
+    with _lock:
+        return _load_table()['decisions'].get(key)
+
+
+def _time_candidate(method_name, particles, max_time, deadline, **options):
+    runtime = []
+    for i in range(BENCHMARK_REPEATS):
+        start_time = time()
+        try:
+            calculate_system_motion(method_name, particles, max_time,
+                                    BENCHMARK_TICKS, **options)
+        except Exception:
+            return None
+        runtime.append(time() - start_time)
+        if time() > deadline:
+            break
+    return min(runtime)
+
+
+def _candidate_backends(particles_count, force_law=None):
+    short_range = force_law is not None and force_law.short_range
+    backends = [backend for backend in available_backends()
+                if backend.name.startswith('verlet')
+                and (backend.neighbour_lists or not short_range)
+                and not (backend.name in PYTHON_LOOP_METHODS
+                         and particles_count > PYTHON_LOOP_LIMIT)]
+    backends.sort(key=lambda backend: backend.name != DEFAULT_METHOD)
+    return backends
+
+
+def _candidate_options(backend):
+    if 'threads_count' not in backend.options:
+        return [{}]
+    cpu_count = probe_capability('cpu_count')
+    counts = sorted({2 ** i for i in range(cpu_count.bit_length()) if 2 ** i <= cpu_count}
+                    | {cpu_count})
+    return [{'threads_count': count} for count in counts]
+
+
+def _generate_benchmark_particles(particles_count):
+    state = np.random.get_state()
+    np.random.seed(0)
+    particles = Emitter().generate_particles(particles_count)
+    np.random.set_state(state)
+    return particles
+
+
+def _bucket(particles_count):
+    return max(2, 1 << (particles_count - 1).bit_length())
+
+
+def _decision_key(particles_count, delta_t, force_law=None):
+    return f'{(force_law or GRAVITY).name}:{_bucket(particles_count)}:{delta_t:.0e}'
+
+
+def _load_table():
+    global _table
+    fingerprint = host_fingerprint()
+    if _table is None and os.path.exists(TABLE_PATH):
+        with open(TABLE_PATH, 'r') as table_file:
+            _table = json.load(table_file)
+    if _table is None or _table.get('fingerprint') != fingerprint:
+        _table = {'fingerprint': fingerprint, 'decisions': {}}
+    return _table
+
+
+def _save_table(table):
+    os.makedirs(os.path.dirname(TABLE_PATH), exist_ok=True)
+    temp_path = f'{TABLE_PATH}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as table_file:
+        json.dump(table, table_file, indent=2)
+    os.replace(temp_path, TABLE_PATH)
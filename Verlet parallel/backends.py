@@ -0,0 +1,148 @@
+import os
+import importlib
+from functools import partial
+from importlib.util import find_spec
+
+NEIGHBOUR_BACKEND = 'verlet_numpy'
+
+_backends = {}
+_capabilities = {}
+
+
+class Backend:
+    def __init__(self, name, label, module, function, requires=(), options=(),
+                 neighbour_lists=False):
+        self.name = name
+        self.label = label
+        self.module = module
+        self.function = function
+        self.requires = requires
+        self.options = options
+        self.neighbour_lists = neighbour_lists
+        self._method = None
+
+    @property
+    def method(self):
+        if self._method is None:
+            module = importlib.import_module(self.module)
+            self._method = getattr(module, self.function)
+        return self._method
+
+    def is_available(self):
+        return all(probe_capability(name) for name in self.requires)
+
+    def bind(self, **options):
+        options = {key: value for key, value in options.items()
+                   if key in self.options and value is not None}
+        if not options:
+            return self.method
+        return partial(self.method, **options)
+
+    def __repr__(self):
+        return f'Backend({self.name!r})'
+
+
+def register_backend(name, label, module, function, requires=(), options=(),
+                     neighbour_lists=False):
+    backend = Backend(name, label, module, function, requires, options, neighbour_lists)
+    _backends[name] = backend
+    return backend
+
+
+def normalize_name(method_name):
+    return method_name.strip().lower().replace(' ', '_')
+
+
+def get_backend(method_name, force_law=None):
+    name = normalize_name(method_name)
+    if name not in _backends:
+        raise ValueError(f'Unknown method {method_name!r}, '
+                         f'expected one of {list(_backends)}')
+    backend = _backends[name]
+    if force_law is not None and force_law.short_range and not backend.neighbour_lists:
+        backend = _backends[NEIGHBOUR_BACKEND]
+    if not backend.is_available():
+        missing = [r for r in backend.requires if not probe_capability(r)]
+        raise RuntimeError(f'Method {backend.label!r} is not available: '
+                           f'missing {", ".join(missing)}')
+    return backend
+
+
+def registered_backends():
+    return list(_backends.values())
+
+
+def available_backends():
+    return [backend for backend in _backends.values() if backend.is_available()]
+
+
+def probe_capability(name, refresh=False):
+    if refresh or name not in _capabilities:
+        _capabilities[name] = _PROBES[name]()
+    return _capabilities[name]
+
+
+def probe_capabilities(refresh=False):
+    return {name: probe_capability(name, refresh) for name in _PROBES}
+
+
+def find_cpu_devices():
+    if find_spec('pyopencl') is None:
+        return []
+    try:
+        import pyopencl as cl
+    except (ImportError, OSError):
+        return []
+
+    try:
+        platforms = cl.get_platforms()
+    except (cl.Error, OSError):
+        return []
+    for platform in platforms:
+        try:
+            devices = platform.get_devices(device_type=cl.device_type.CPU)
+        except (cl.Error, OSError):
+            continue
+        if devices:
+            return devices
+    return []
+
+
+_PROBES = {
+    'cpu_count': lambda: os.cpu_count() or 1,
+    'scipy': lambda: find_spec('scipy') is not None,
+    'cython_extension': lambda: find_spec('verlet_cython') is not None,
+    'opencl_cpu': lambda: bool(find_cpu_devices()),
+}
+
+# Only backends registered with neighbour_lists evaluate short-range force laws
+# on a cell list; get_backend sends those laws to NEIGHBOUR_BACKEND otherwise.
+register_backend('odeint', 'Odeint', 'gravity_simulation', 'calculate_odeint',
+                 requires=('scipy',), options=('rtol', 'atol', 'jacobian', 'force_law'),
+                 neighbour_lists=True)
+register_backend('solve_ivp', 'Solve ivp', 'gravity_simulation', 'calculate_ivp',
+                 requires=('scipy',), options=('solver', 'rtol', 'atol', 'jacobian', 'force_law'),
+                 neighbour_lists=True)
+register_backend('verlet_sequential', 'Verlet sequential',
+                 'gravity_simulation', 'calculate_verlet', options=('force_law',))
+register_backend('verlet_threading', 'Verlet threading',
+                 'gravity_simulation', 'calculate_verlet_threading',
+                 options=('threads_count', 'force_law'))
+register_backend('verlet_multiprocessing', 'Verlet multiprocessing',
+                 'gravity_simulation', 'calculate_verlet_multiprocessing',
+                 options=('threads_count', 'force_law'))
+register_backend('verlet_numpy', 'Verlet numpy', 'gravity_simulation',
+                 'calculate_verlet_numpy',
+                 options=('precision', 'force_law', 'reorder_every'), neighbour_lists=True)
+register_backend('verlet_cython', 'Verlet cython', 'verlet_cython',
+                 'calculate_verlet_cython', requires=('cython_extension',),
+                 options=('precision', 'force_law'))
+register_backend('verlet_opencl', 'Verlet opencl', 'gravity_simulation',
+                 'calculate_verlet_opencl', requires=('opencl_cpu',),
+                 options=('precision', 'force_law'))
+register_backend('parareal', 'Parareal', 'parareal', 'calculate_parareal',
+                 options=('slices_count', 'coarse_ratio', 'tolerance', 'max_iterations',
+                          'fine_method', 'processes_count', 'force_law'),
+                 neighbour_lists=True)
+register_backend('auto', 'Auto', 'autotune', 'calculate_auto', options=('force_law',),
+                 neighbour_lists=True)
@@ -0,0 +1,128 @@
+import os
+import argparse
+import numpy as np
+from time import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from emitter import Emitter
+from loading import load_data
+from forces import parse_force_law
+from gravity_simulation import NODES, iterate_system_motion
+from checkpoint import iterate_checkpointed_motion, resume_system_motion
+
+
+def load_scenario(scenario, seed=None):
+    emitter = Emitter()
+    if scenario.startswith('random:'):
+        if seed is not None:
+            np.random.seed(seed)
+        emitter.generate_particles(int(scenario.split(':', 1)[1]))
+    else:
+        load_data(scenario, emitter)
+    return emitter.particles
+
+
+def run_scenario(scenario, method_name, tick_count, delta_t, threads_count=None,
+                 chunk_size=100, output_dir='.', seed=None,
+                 checkpoint_every=None, resume=False, force_law=None,
+                 reorder_every=None):
+    name = os.path.splitext(os.path.basename(scenario))[0].replace(':', '_')
+    file_name = os.path.join(output_dir, f'{name}_{method_name}.npy')
+    checkpoint_file = f'{file_name}.ckpt'
+
+    if resume and os.path.exists(checkpoint_file):
+        trajectory = np.lib.format.open_memmap(file_name, mode='r+')
+        tick, chunks = resume_system_motion(checkpoint_file)
+        tick += 1
+    else:
+        particles = load_scenario(scenario, seed)
+        trajectory = np.lib.format.open_memmap(file_name, mode='w+', dtype=np.float64,
+                                               shape=(tick_count, len(particles), NODES))
+        tick = 0
+        if checkpoint_every:
+            chunks = iterate_checkpointed_motion(method_name, particles, delta_t, tick_count,
+                                                 checkpoint_file, checkpoint_every, chunk_size,
+                                                 threads_count=threads_count,
+                                                 force_law=force_law,
+                                                 reorder_every=reorder_every)
+        else:
+            chunks = iterate_system_motion(method_name, particles, delta_t, tick_count,
+                                           chunk_size, threads_count=threads_count,
+                                           force_law=force_law, reorder_every=reorder_every)
+
+    start_time = time()
+    start_tick = max(tick - 1, 0)
+    for chunk in chunks:
+        trajectory[tick: tick + len(chunk)] = chunk
+        tick += len(chunk)
+    trajectory.flush()
+    elapsed = time() - start_time
+    particles_count = trajectory.shape[1]
+    del trajectory
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    particle_steps = particles_count * (tick - 1 - start_tick)
+    return {'scenario': scenario, 'file': file_name, 'particles': particles_count,
+            'ticks': tick, 'time': elapsed, 'rate': particle_steps / elapsed if elapsed > 0 else 0.0}
+
+
+def _print_result(result):
+    print(f"{result['scenario']}: {result['particles']} particles, "
+          f"{result['ticks']} ticks, {result['time']:.3f} s, "
+          f"{result['rate']:.4g} particle-steps/s -> {result['file']}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Run Verlet parallel scenarios without a display')
+    parser.add_argument('scenarios', nargs='+',
+                        help='scenario json files or random:N for N generated particles')
+    parser.add_argument('--method', default='verlet_sequential')
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--delta-t', type=float, default=1.0)
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads or processes per scenario for parallel methods, '
+                             'default the cpu cap split between concurrent scenarios')
+    parser.add_argument('--cpus', type=int, default=os.cpu_count(),
+                        help='total cpu cap shared by concurrent scenarios')
+    parser.add_argument('--chunk', type=int, default=100,
+                        help='ticks computed between trajectory writes')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--checkpoint-every', type=int, default=None,
+                        help='ticks between background checkpoints of the integrator state')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue scenarios from their last checkpoint if one exists')
+    parser.add_argument('--force-law', type=parse_force_law, default=None,
+                        help='name[:key=value,...], e.g. lennard_jones:epsilon=1,sigma=2')
+    parser.add_argument('--reorder-every', type=int, default=None,
+                        help='ticks between Morton reorderings of the particles (verlet_numpy)')
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    cpus = max(1, args.cpus)
+    workers = max(1, min(cpus // (args.threads or 1), len(args.scenarios)))
+    threads_count = args.threads or max(1, cpus // workers)
+    kwargs = dict(method_name=args.method, tick_count=args.ticks, delta_t=args.delta_t,
+                  threads_count=threads_count, chunk_size=args.chunk,
+                  output_dir=args.output_dir, seed=args.seed,
+                  checkpoint_every=args.checkpoint_every, resume=args.resume,
+                  force_law=args.force_law, reorder_every=args.reorder_every)
+
+    if workers == 1:
+        for scenario in args.scenarios:
+            _print_result(run_scenario(scenario, **kwargs))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_scenario, scenario, **kwargs)
+                   for scenario in args.scenarios]
+        for future in as_completed(futures):
+            _print_result(future.result())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+from time import time
+from collections import deque
+
+from backends import available_backends, normalize_name
+
+MAX_SUBSTEPS = 8
+WINDOW = 8
+HIGH_LOAD = 0.9
+LOW_LOAD = 0.5
+FALLBACK_METHODS = ('verlet_numpy', 'verlet_opencl')
+
+
+class FrameBudgetController:
+    def __init__(self, method_name, budget, max_substeps=MAX_SUBSTEPS, window=WINDOW):
+        self.budget = budget
+        self.max_substeps = max_substeps
+        self.substeps = 1
+        self._step_times = deque(maxlen=window)
+        self._timestamps = deque(maxlen=window)
+        self.set_method(method_name)
+
+    @property
+    def quality(self):
+        return self.substeps / self.max_substeps
+
+    @property
+    def fps(self):
+        if len(self._timestamps) < 2:
+            return 0.0
+        return (len(self._timestamps) - 1) / (self._timestamps[-1] - self._timestamps[0])
+
+    @property
+    def load(self):
+        if not self._step_times:
+            return 0.0
+        return np.mean(self._step_times) / self.budget
+
+    def set_method(self, method_name):
+        self.method_name = method_name
+        self.active_method = method_name
+        available = {backend.name for backend in available_backends()}
+        self._fallbacks = [name for name in FALLBACK_METHODS
+                           if name in available and name != normalize_name(method_name)]
+        self._previous = None
+        self._reset()
+
+    def record(self, elapsed):
+        self._step_times.append(elapsed)
+        self._timestamps.append(time())
+        if len(self._step_times) < self._step_times.maxlen:
+            return
+
+        load = self.load
+        if self._previous is not None:
+            method_name, previous_load = self._previous
+            self._previous = None
+            if load > previous_load:
+                self.active_method = method_name
+                self._fallbacks = []
+                self._reset()
+                return
+
+        if load > HIGH_LOAD:
+            self._degrade(load)
+        elif load < LOW_LOAD and self.substeps < self.max_substeps:
+            per_substep = load / self.substeps
+            self.substeps = min(self.max_substeps,
+                                max(self.substeps + 1, int(HIGH_LOAD * 0.8 / per_substep)))
+            self._reset()
+
+    def current_method(self):
+        return self.active_method
+
+    def _degrade(self, load):
+        if self.substeps > 1:
+            self.substeps = max(1, int(self.substeps * HIGH_LOAD / load))
+            self._reset()
+        elif self._fallbacks:
+            self._previous = (self.active_method, load)
+            self.active_method = self._fallbacks.pop(0)
+            self._reset()
+
+    def _reset(self):
+        self._step_times.clear()
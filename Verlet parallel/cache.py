@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+import numpy as np
+from time import time
+
+from backends import get_backend, registered_backends
+from gravity_simulation import calculate_system_motion, _convert_object_to_array
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ctmm', 'results')
+CACHE_SIZE = 2 ** 30
+SOURCE_FILES = ('backends.py', 'forces.py', 'neighbours.py', 'simulator.py', 'arena.py')
+
+_code_version = None
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def calculate(self, method_name, particles, max_time, tick_count, **options):
+        key = result_key(method_name, _convert_object_to_array(particles),
+                         max_time, tick_count, options)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        start_time = time()
+        result = calculate_system_motion(method_name, particles, max_time, tick_count, **options)
+        metadata = {'method_name': method_name, 'options': _encode(options),
+                    'max_time': max_time, 'tick_count': tick_count,
+                    'runtime': time() - start_time}
+        self.put(key, result, metadata)
+        return result, metadata
+
+    def get(self, key):
+        result_path, metadata_path = self._paths(key)
+        if not os.path.exists(result_path) or not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, 'r') as metadata_file:
+            metadata = json.load(metadata_file)
+        result = np.load(result_path)
+        os.utime(result_path)
+        return result, metadata
+
+    def put(self, key, result, metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        result_path, metadata_path = self._paths(key)
+        temp_path = f'{result_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as result_file:
+            np.save(result_file, result)
+        os.replace(temp_path, result_path)
+        with open(temp_path, 'w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+        os.replace(temp_path, metadata_path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name[:-len('.npy')]))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+
+    def _paths(self, key):
+        path = os.path.join(self.directory, key)
+        return f'{path}.npy', f'{path}.json'
+
+
+def result_key(method_name, data, max_time, tick_count, options):
+    backend = get_backend(method_name, options.get('force_law'))
+    options = {key: value for key, value in options.items() if key in backend.options}
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'method_name': backend.name, 'max_time': max_time,
+                              'tick_count': tick_count, 'code_version': code_version(),
+                              'options': _encode(options)}, sort_keys=True).encode())
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    digest.update(str(data.shape).encode())
+    digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+def code_version():
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCE_FILES + _backend_sources(directory):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as source_file:
+                    digest.update(source_file.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _backend_sources(directory):
+    sources = []
+    for module in sorted({backend.module for backend in registered_backends()}):
+        name = f'{module}.pyx'
+        if not os.path.exists(os.path.join(directory, name)):
+            name = f'{module}.py'
+        sources.append(name)
+    return tuple(sources)
+
+
+def _encode(options):
+    return {key: value.to_config() if hasattr(value, 'to_config') else value
+            for key, value in sorted(options.items()) if value is not None}
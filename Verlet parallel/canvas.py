@@ -1,30 +1,104 @@
 import wx
+from time import perf_counter
+import numpy as np
 import matplotlib
 matplotlib.use('WXAgg')
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 
+from counters import RollingCounter
+
+DENSITY_THRESHOLD = 5000
+DENSITY_BINS = 256
+
+
+class _FrameCanvas(FigureCanvas):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.render_time = RollingCounter()
+        self._frame_start = None
+
+    def start_frame(self):
+        self._frame_start = perf_counter()
+
+    def draw(self, drawDC=None):
+        start_time = perf_counter()
+        super().draw(drawDC)
+        self._finish_frame(start_time)
+
+    def blit(self, bbox=None):
+        super().blit(bbox)
+        self._finish_frame(self._frame_start)
+
+    def _finish_frame(self, start_time):
+        if self._frame_start is not None:
+            self.render_time.add(perf_counter() - start_time)
+            self._frame_start = None
+
 
 class CanvasPanel(wx.Panel):
-    def __init__(self, parent):
+    def __init__(self, parent, density_threshold=DENSITY_THRESHOLD, density_bins=DENSITY_BINS):
         super().__init__(parent, size=(800, 480))
         matplotlib.rc('axes', edgecolor='black', linewidth=1)
+        self.density_threshold = density_threshold
+        self._density_bins = density_bins
+        self._style_version = None
         self.figure = Figure()
         self._axes = self.figure.add_axes([0, 0, 1, 1])
         self._axes.set(xlim=(0, 1), ylim=(0, 1))
-        self._scat = self._axes.scatter(x=[], y=[])
-        self._canvas = FigureCanvas(self, id=-1, figure=self.figure)
+        self._scat = self._axes.scatter(x=[], y=[], animated=True)
+        self._image = self._axes.imshow(np.zeros((density_bins, density_bins)),
+                                        extent=(0, 1, 0, 1), origin='lower', aspect='auto',
+                                        cmap='inferno', interpolation='nearest',
+                                        animated=True, visible=False)
+        self._canvas = _FrameCanvas(self, id=-1, figure=self.figure)
         self.figure.set_canvas(self._canvas)
         box_sizer = wx.BoxSizer(wx.VERTICAL)
         box_sizer.Add(self._canvas, proportion=1, flag=wx.EXPAND | wx.TOP, border=6)
         self.SetSizer(box_sizer)
         self.Fit()
 
-    def draw_markers(self, marker_positions, marker_sizes, marker_colors):
+    @property
+    def render_time(self):
+        return self._canvas.render_time
+
+    def start_frame(self):
+        self._canvas.start_frame()
+
+    @property
+    def artists(self):
+        return [self._image, self._scat]
+
+    def draw_markers(self, marker_positions, marker_sizes, marker_colors, style_version=None):
+        if len(marker_positions) > self.density_threshold:
+            self._draw_density(marker_positions)
+        else:
+            self._draw_scatter(marker_positions, marker_sizes, marker_colors, style_version)
+        return self.artists
+
+    def _draw_scatter(self, marker_positions, marker_sizes, marker_colors, style_version):
+        if self._image.get_visible():
+            self._image.set_visible(False)
+            self._scat.set_visible(True)
         self._scat.set_offsets(marker_positions)
-        self._scat.set_sizes(marker_sizes)
-        self._scat.set_facecolors(marker_colors)
+        if style_version is None or style_version != self._style_version:
+            self._scat.set_sizes(marker_sizes)
+            self._scat.set_facecolors(marker_colors)
+            self._style_version = style_version
+
+    def _draw_density(self, marker_positions):
+        if self._scat.get_visible():
+            self._scat.set_visible(False)
+            self._image.set_visible(True)
+        histogram, _, _ = np.histogram2d(marker_positions[:, 1], marker_positions[:, 0],
+                                         bins=self._density_bins, range=[[0, 1], [0, 1]])
+        histogram = np.log1p(histogram)
+        self._image.set_data(histogram)
+        self._image.set_clim(0, max(histogram.max(), 1))
 
     def clear(self):
-        self._scat.remove()
-        self._scat = self._axes.scatter(x=[], y=[])
+        self._scat.set_offsets(np.zeros((0, 2)))
+        self._scat.set_visible(True)
+        self._image.set_visible(False)
+        self._style_version = None
+        return self.artists
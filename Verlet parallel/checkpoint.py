@@ -0,0 +1,111 @@
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+from forces import ForceLaw, force_law_from_config
+from gravity_simulation import iterate_data_motion, _convert_object_to_array
+
+
+class CheckpointWriter(threading.Thread):
+    def __init__(self, file_name, pending=2):
+        super().__init__(daemon=True)
+        self.file_name = file_name
+        self._states = queue.Queue(maxsize=pending)
+        self._error = None
+        self.start()
+
+    def submit(self, state):
+        if self._error is not None:
+            raise self._error
+        self._states.put(state)
+
+    def close(self):
+        self._states.put(None)
+        self.join()
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        while True:
+            state = self._states.get()
+            if state is None:
+                return
+            try:
+                save_checkpoint(self.file_name, state)
+            except Exception as error:
+                self._error = error
+
+
+def make_state(data, tick, config):
+    return {'data': np.array(data, dtype=np.float64), 'tick': tick,
+            'rng_state': np.random.get_state(), 'config': config}
+
+
+def save_checkpoint(file_name, state):
+    rng_name, rng_keys, rng_pos, rng_has_gauss, rng_gauss = state['rng_state']
+    temp_name = f'{file_name}.tmp'
+    with open(temp_name, 'wb') as checkpoint_file:
+        np.savez_compressed(checkpoint_file, data=state['data'],
+                            tick=np.array(state['tick']),
+                            rng_name=np.array(rng_name), rng_keys=rng_keys,
+                            rng_params=np.array([rng_pos, rng_has_gauss, rng_gauss]),
+                            config=np.array(json.dumps(state['config'])))
+    os.replace(temp_name, file_name)
+
+
+def load_checkpoint(file_name):
+    with np.load(file_name) as archive:
+        rng_pos, rng_has_gauss, rng_gauss = archive['rng_params']
+        rng_state = (str(archive['rng_name']), archive['rng_keys'],
+                     int(rng_pos), int(rng_has_gauss), float(rng_gauss))
+        return {'data': archive['data'], 'tick': int(archive['tick']), 'rng_state': rng_state,
+                'config': json.loads(str(archive['config']))}
+
+
+def iterate_checkpointed_motion(method_name, particles, delta_t, tick_count, file_name,
+                                checkpoint_every=1000, chunk_size=100, **options):
+    config = {'method_name': method_name, 'options': _encode_options(options), 'delta_t': delta_t,
+              'tick_count': tick_count, 'chunk_size': chunk_size,
+              'checkpoint_every': checkpoint_every}
+    data = _convert_object_to_array(particles)
+    yield data[np.newaxis].copy()
+    yield from _iterate_with_checkpoints(data, 0, config, file_name)
+
+
+def resume_system_motion(file_name):
+    state = load_checkpoint(file_name)
+    np.random.set_state(state['rng_state'])
+    data = state['data'].copy()
+    return state['tick'], _iterate_with_checkpoints(data, state['tick'],
+                                                    state['config'], file_name)
+
+
+def _iterate_with_checkpoints(data, tick, config, file_name):
+    tick_count = config['tick_count']
+    last_checkpoint = tick
+    writer = CheckpointWriter(file_name)
+    try:
+        for chunk in iterate_data_motion(config['method_name'], data, config['delta_t'],
+                                         tick_count - 1 - tick, config['chunk_size'],
+                                         **_decode_options(config['options'])):
+            tick += len(chunk)
+            yield chunk
+            if tick - last_checkpoint >= config['checkpoint_every'] and tick < tick_count - 1:
+                writer.submit(make_state(chunk[-1], tick, config))
+                last_checkpoint = tick
+    finally:
+        writer.close()
+
+
+def _encode_options(options):
+    return {key: value.to_config() if isinstance(value, ForceLaw) else value
+            for key, value in options.items()}
+
+
+def _decode_options(options):
+    options = dict(options)
+    if options.get('force_law') is not None:
+        options['force_law'] = force_law_from_config(options['force_law'])
+    return options
@@ -0,0 +1,85 @@
+import socket
+import threading
+
+from simulation_thread import Frame, FrameBuffer
+from protocol import (FrameDecoder, STYLE, HEADER, unpack_header,
+                      pack_command, parse_address)
+
+
+class RemoteSimulation(threading.Thread):
+    def __init__(self, address, buffer_size=4):
+        super().__init__(daemon=True)
+        self.frames = FrameBuffer(buffer_size)
+        self._decoder = FrameDecoder()
+        self._socket = _connect(address)
+        self._send_lock = threading.Lock()
+        self._is_alive = True
+
+    def send(self, command, payload=None):
+        with self._send_lock:
+            self._socket.sendall(pack_command(command, payload))
+
+    def start_simulation(self):
+        self.send('start')
+
+    def stop_simulation(self):
+        self.send('stop')
+
+    def clear(self):
+        self.send('clear')
+
+    def set_particles(self, particles):
+        self.send('set', list(particles))
+
+    def add_particle(self, particle):
+        self.send('add', particle)
+
+    def set_method(self, method_name):
+        self.send('method', method_name)
+
+    def set_delta_t(self, delta_t):
+        self.send('delta_t', delta_t)
+
+    def set_view(self, max_coord, is_solar_mode):
+        self.send('view', {'max_coord': float(max_coord), 'is_solar_mode': bool(is_solar_mode)})
+
+    def shutdown(self):
+        self._is_alive = False
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self.join()
+
+    def run(self):
+        try:
+            while self._is_alive:
+                kind, index, style_version, size = unpack_header(self._receive(HEADER.size))
+                positions = self._decoder.decode(kind, self._receive(size))
+                if kind == STYLE:
+                    continue
+                self.frames.put(Frame(index, positions, self._decoder.sizes,
+                                      self._decoder.colors, style_version,
+                                      self._decoder.indices, self._decoder.max_coord,
+                                      self._decoder.is_solar_mode))
+        except (ConnectionError, OSError):
+            pass
+
+    def _receive(self, size):
+        chunks = []
+        while size:
+            chunk = self._socket.recv(size)
+            if not chunk:
+                raise ConnectionError('Simulation server closed the connection')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+def _connect(address):
+    kind, address = parse_address(address)
+    family = socket.AF_UNIX if kind == 'unix' else socket.AF_INET
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    connection.connect(address)
+    return connection
@@ -4,29 +4,39 @@ from copy import deepcopy
 import matplotlib.pyplot as plt
 
 from emitter import Emitter
+from cache import ResultCache
+from simulator import Simulator
+from parareal import Parareal
+from gravity_simulation import _convert_object_to_array
 from loading import load_data
-from gravity_simulation import calculate_system_motion
+from backends import available_backends, get_backend, probe_capabilities
 
+SEED = 0
 
-def compare_methods_accuracy(method_names, max_time, tick_count, particles_count=None):
+
+def compare_methods_accuracy(method_names, max_time, tick_count, particles_count=None,
+                             precisions=('double',), cache=None, seed=SEED):
+    cache = cache or ResultCache()
     emitter = Emitter()
     if particles_count is None:
         file_to_read = 'solar_system.json'
         load_data(file_to_read, emitter)
         particles = emitter.particles
     else:
-        particles = emitter.generate_particles(particles_count)
+        particles = _generate_particles(emitter, particles_count, seed)
 
     ticks = range(tick_count)
     total_metric_list = []
     runtime = []
     results = []
-
-    for name in method_names:
-        print(f'{name} is executed')
-        start_time = time()
-        result = calculate_system_motion(name, deepcopy(particles), max_time, tick_count)
-        runtime.append(time() - start_time)
+    runs = _expand_precisions(method_names, precisions)
+    method_names = [label for label, _, _ in runs]
+
+    for label, name, precision in runs:
+        print(f'{label} is executed')
+        result, metadata = cache.calculate(name, deepcopy(particles), max_time,
+                                           tick_count, precision=precision)
+        runtime.append(metadata['runtime'])
         results.append(result)
 
     for i in range(len(results)):
@@ -39,6 +49,12 @@ def compare_methods_accuracy(method_names, max_time, tick_count, particles_count
             local_metric_list.append(metric)
         total_metric_list.append(local_metric_list)
 
+    scale = np.sum(np.linalg.norm(results[0][:, :, :2], axis=2), axis=1)
+    for label, metric in zip(method_names, total_metric_list):
+        relative = np.divide(metric, scale, out=np.zeros(len(scale)), where=scale > 0)
+        print(f'{label}: mean error {np.mean(metric):.4g}, '
+              f'max relative error {np.max(relative):.4g}')
+
     delta_t = max_time / tick_count
     _built_metric_plot(method_names, ticks, total_metric_list, delta_t)
     test_file = 'test.txt'
@@ -46,11 +62,31 @@ def compare_methods_accuracy(method_names, max_time, tick_count, particles_count
                    runtime, total_metric_list, delta_t)
 
 
-def compare_methods_runtime(method_names, count_list, max_time, tick_count, iter_count=3):
+def _expand_precisions(method_names, precisions):
+    runs = []
+    for name in method_names:
+        for precision in precisions:
+            if precision != 'double' and 'precision' not in get_backend(name).options:
+                continue
+            label = name if precision == 'double' else f'{name}_{precision}'
+            runs.append((label, name, precision))
+    return runs
+
+
+def _generate_particles(emitter, particles_count, seed):
+    state = np.random.get_state()
+    np.random.seed(seed)
+    particles = emitter.generate_particles(particles_count)
+    np.random.set_state(state)
+    return particles
+
+
+def compare_methods_runtime(method_names, count_list, max_time, tick_count,
+                            iter_count=3, seed=SEED):
     particles = []
     emitter = Emitter()
     for count in count_list:
-        particles.append(emitter.generate_particles(count))
+        particles.append(_generate_particles(emitter, count, seed))
 
     runtime = []
     for name in method_names:
@@ -78,13 +114,45 @@ def calculate_method_runtime(method_name, particles, max_time, tick_count, iter_
         print(f'{len(particles[i])} particles are calculated')
         runtime = []
         for j in range(iter_count):
+            simulator = Simulator(method_name, particles[i], max_time / tick_count,
+                                  capacity=len(particles[i]), lifetimes=False)
             start_time = time()
-            calculate_system_motion(method_name, particles[i], max_time, tick_count)
+            simulator.step(tick_count - 1)
             runtime.append(time() - start_time)
         results.append(np.mean(runtime))
     return results
 
 
+def compare_parareal(max_time, tick_count, fine_method='verlet_numpy', iter_count=3, **options):
+    emitter = Emitter()
+    load_data('solar_system.json', emitter)
+    data = _convert_object_to_array(emitter.particles)
+    method = get_backend(fine_method).method
+    serial_time = _best_runtime(lambda: method(data, max_time, tick_count), iter_count)
+    serial = method(data, max_time, tick_count)
+
+    parareal = Parareal(fine_method, **options)
+    parallel_time = _best_runtime(lambda: parareal.calculate(data, max_time, tick_count),
+                                  iter_count)
+    result = parareal.calculate(data, max_time, tick_count)
+    error = np.max(np.linalg.norm(result[:, :, :2] - serial[:, :, :2], axis=2))
+    scale = np.max(np.linalg.norm(serial[:, :, :2], axis=2))
+    print(f'parareal ({fine_method}, {parareal.processes_count} processes): '
+          f'{parallel_time:.3f} s against {serial_time:.3f} s serial, '
+          f'speedup {serial_time / parallel_time:.2f}, {parareal.iterations} iterations, '
+          f'max relative deviation {error / scale:.3g}')
+    return serial_time / parallel_time
+
+
+def _best_runtime(function, iter_count):
+    runtime = []
+    for i in range(iter_count):
+        start_time = time()
+        function()
+        runtime.append(time() - start_time)
+    return min(runtime)
+
+
 def _build_time_plot(method_names, count_list, results, ylabel):
     for i in range(len(method_names)):
         plt.plot(count_list, results[i], label=method_names[i])
@@ -122,7 +190,8 @@ def _write_to_file(file_name, method_names, particles_count,
         for i in range(len(method_names)):
             result = f'Method: {method_names[i]}, '
             result += f'time: {exec_time[i]}, '
-            result += f'metric: {np.mean(metric_list[i])}\n'
+            result += f'metric: {np.mean(metric_list[i])}, '
+            result += f'max metric: {np.max(metric_list[i])}\n'
             file.write(result)
         file.write('\n')
 
@@ -131,11 +200,17 @@ def main():
     max_time = 10
     tick_count = 100
     particles_count = 50
-    method_names = ['odeint', 'verlet_sequential', 'verlet_threading',
-                    'verlet_multiprocessing', 'verlet_cython', 'verlet_opencl']
+    print(f'Capabilities: {probe_capabilities()}')
+    method_names = [backend.name for backend in available_backends()
+                    if backend.name not in ('auto', 'parareal')]
     compare_methods_accuracy(method_names, max_time, tick_count, particles_count)
+    mixed_names = [name for name in method_names
+                   if 'precision' in get_backend(name).options]
+    compare_methods_accuracy(mixed_names, 10 ** 6 * tick_count, tick_count,
+                             precisions=('double', 'single'))
     iter_count = 5
-    del method_names[0]
+    method_names = [name for name in method_names if name != 'odeint']
+    compare_parareal(365 * 86400, 365 * 24)
     count_list = [50, 100, 200, 400]
     compare_methods_runtime(method_names, count_list, max_time, tick_count, iter_count)
 
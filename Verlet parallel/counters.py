@@ -0,0 +1,44 @@
+from time import perf_counter
+from collections import deque
+
+WINDOW = 50
+RATE_WINDOW = 2.0
+
+
+class RollingCounter:
+    def __init__(self, window=WINDOW):
+        self._values = deque(maxlen=window)
+
+    def add(self, value):
+        self._values.append(value)
+
+    @property
+    def mean(self):
+        values = list(self._values)
+        return sum(values) / len(values) if values else 0.0
+
+    def clear(self):
+        self._values.clear()
+
+
+class RateCounter:
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._events = deque()
+
+    def add(self, count=1):
+        now = perf_counter()
+        self._events.append((now, count))
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+    @property
+    def rate(self):
+        events = list(self._events)
+        if len(events) < 2:
+            return 0.0
+        elapsed = events[-1][0] - events[0][0]
+        return sum(count for _, count in events[1:]) / elapsed if elapsed > 0 else 0.0
+
+    def clear(self):
+        self._events.clear()
@@ -0,0 +1,109 @@
+import numpy as np
+
+G = 6.6743015e-11
+
+
+class ForceLaw:
+    name = None
+    code = None
+    short_range = False
+
+    def factor(self, dist2, mass_i, mass_j, radius_i, radius_j):
+        raise NotImplementedError
+
+    def cutoff_for(self, radii):
+        return None
+
+    def kernel_parameters(self):
+        raise NotImplementedError
+
+    def to_config(self):
+        return {'name': self.name, **self.__dict__}
+
+    def __repr__(self):
+        params = ', '.join(f'{key}={value!r}' for key, value in self.__dict__.items())
+        return f'{type(self).__name__}({params})'
+
+
+class Gravity(ForceLaw):
+    name = 'gravity'
+    code = 0
+
+    def __init__(self, G=G, softening=0.0):
+        self.G = G
+        self.softening = softening
+
+    def factor(self, dist2, mass_i, mass_j, radius_i, radius_j):
+        dist2 = dist2 + self.softening ** 2
+        return self.G * mass_j / dist2 / np.sqrt(dist2)
+
+    def kernel_parameters(self):
+        return self.code, self.G, self.softening ** 2, 0.0
+
+
+class SoftenedGravity(Gravity):
+    name = 'softened_gravity'
+
+    def __init__(self, softening=1.0, G=G):
+        super().__init__(G, softening)
+
+
+class LennardJones(ForceLaw):
+    name = 'lennard_jones'
+    code = 1
+    short_range = True
+
+    def __init__(self, epsilon=1.0, sigma=1.0, cutoff=None):
+        self.epsilon = epsilon
+        self.sigma = sigma
+        self.cutoff = 2.5 * sigma if cutoff is None else cutoff
+
+    def factor(self, dist2, mass_i, mass_j, radius_i, radius_j):
+        ratio6 = (self.sigma ** 2 / dist2) ** 3
+        factor = -24 * self.epsilon * (2 * ratio6 * ratio6 - ratio6) / (dist2 * mass_i)
+        return np.where(dist2 < self.cutoff ** 2, factor, 0)
+
+    def cutoff_for(self, radii):
+        return self.cutoff
+
+    def kernel_parameters(self):
+        return self.code, self.epsilon, self.sigma ** 2, self.cutoff ** 2
+
+
+class SoftSpheres(ForceLaw):
+    name = 'soft_spheres'
+    code = 2
+    short_range = True
+
+    def __init__(self, stiffness=1.0):
+        self.stiffness = stiffness
+
+    def factor(self, dist2, mass_i, mass_j, radius_i, radius_j):
+        contact = radius_i + radius_j
+        dist = np.sqrt(dist2)
+        overlap = np.maximum(contact - dist, 0)
+        return -self.stiffness * overlap / (dist * mass_i)
+
+    def cutoff_for(self, radii):
+        return 2 * float(np.max(radii)) if len(radii) else None
+
+    def kernel_parameters(self):
+        return self.code, self.stiffness, 0.0, 0.0
+
+
+GRAVITY = Gravity()
+FORCE_LAWS = {law.name: law for law in (Gravity, SoftenedGravity, LennardJones, SoftSpheres)}
+
+
+def force_law_from_config(config):
+    config = dict(config)
+    return FORCE_LAWS[config.pop('name')](**config)
+
+
+def parse_force_law(spec):
+    name, _, params = spec.partition(':')
+    config = {'name': name}
+    for item in filter(None, params.split(',')):
+        key, value = item.split('=')
+        config[key] = float(value)
+    return force_law_from_config(config)
@@ -1,16 +1,22 @@
 import wx
 import numpy as np
+from time import perf_counter
 from wx.lib.masked import NumCtrl
 from matplotlib.animation import FuncAnimation
 
 from emitter import Emitter
 from loading import load_data
 from canvas import CanvasPanel
-from gravity_simulation import calculate_particle_motion
+from backends import available_backends
+from counters import RollingCounter
+from simulation_thread import SimulationThread
+
+FPS = 25
+HUD_FIELDS = (-2, -1, -1, -1, -2, -3)
 
 
 class Form(wx.Frame):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, simulation=None, **kwargs):
         super().__init__(*args, **kwargs)
         self._panel = wx.Panel(self)
         self._panel_sizer = wx.GridBagSizer()
@@ -19,7 +25,6 @@ class Form(wx.Frame):
         self._max_coord = 0.0
         ctrl_size = (35, -1)
         value = 1
-        self._is_calculated = False
         self._is_solar_mode = False
         self._emitter = Emitter([value, value], [value, value])
 
@@ -29,10 +34,23 @@ class Form(wx.Frame):
         self._init_operations_block()
         self._init_canvas_block()
 
+        if simulation is None:
+            simulation = SimulationThread(self._widgets['method'].GetValue())
+        self._simulation = simulation
+        self._simulation.start()
+        status_bar = self.CreateStatusBar(len(HUD_FIELDS))
+        status_bar.SetStatusWidths(list(HUD_FIELDS))
+        self._frame_time = RollingCounter()
+        self._last_frame_time = None
+        self._particles_count = 0
+        self._drawn_frames = 0
+        self.Bind(wx.EVT_CLOSE, self._on_close)
+
         self._panel.SetSizer(self._panel_sizer)
         self._panel_sizer.Fit(self)
         self.Show()
-        self.animation = FuncAnimation(self._canvas.figure, self._update_canvas, interval=100)
+        self.animation = FuncAnimation(self._canvas.figure, self._update_canvas,
+                                       interval=1000 // FPS, blit=True)
 
     def _init_emitter_block(self, ctrl_size, value):
         static_box = wx.StaticBox(self._panel, label="Emitter")
@@ -129,9 +147,10 @@ class Form(wx.Frame):
     def _init_method_block(self):
         static_box = wx.StaticBox(self._panel, label="Method")
         box_sizer = wx.StaticBoxSizer(static_box, wx.VERTICAL)
-        methods = ['Odeint', 'Verlet sequential', 'Verlet threading',
-                   'Verlet multiprocessing', 'Verlet cython', 'Verlet opencl']
-        combo_box = wx.ComboBox(self._panel, choices=methods, value=methods[0], style=wx.CB_READONLY)
+        methods = [backend.label for backend in available_backends()]
+        value = 'Auto' if 'Auto' in methods else methods[0]
+        combo_box = wx.ComboBox(self._panel, choices=methods, value=value, style=wx.CB_READONLY)
+        combo_box.Bind(wx.EVT_COMBOBOX, self._on_method_change)
         self._widgets['method'] = combo_box
 
         box_sizer.Add(combo_box, flag=wx.EXPAND | wx.ALL, border=4)
@@ -194,63 +213,94 @@ class Form(wx.Frame):
     def _on_emitter_change_click(self, event):
         self._change_emitter()
 
+    def _on_method_change(self, event):
+        self._simulation.set_method(self._widgets['method'].GetValue())
+
     def _on_random_particle_generation_click(self, event):
         self._clear()
-        self._is_solar_mode = False
         widget = self._widgets['random_generation']
         value = widget.GetValue()
         self._emitter.generate_particles_gui(value)
-        self._max_coord = self._emitter.max_coord
-        self._is_calculated = True
+        self._set_view(self._emitter.max_coord, False)
+        self._simulation.set_particles(self._emitter.particles)
+        self._simulation.start_simulation()
+        self._emitter.particles = []
 
     def _on_single_particle_generation_click(self, event):
         if self._is_solar_mode:
             self._clear()
-            self._is_solar_mode = False
         self._change_emitter()
         u_speed = self._widgets['u_speed'].GetValue()
         v_speed = self._widgets['v_speed'].GetValue()
         life_time = self._widgets['life_time'].GetValue()
         color = self._widgets['color'].GetBackgroundColour()
         mass = self._widgets['mass'].GetValue()
-        self._emitter.create_particle(speed=[u_speed, v_speed], mass=mass,
-                                      color=color, life_time=life_time)
-        self._max_coord = self._emitter.max_coord
-        self._is_calculated = True
+        particle = self._emitter.create_particle(speed=[u_speed, v_speed], mass=mass,
+                                                 color=color, life_time=life_time)
+        self._set_view(self._emitter.max_coord, False)
+        self._simulation.add_particle(particle)
+        self._simulation.start_simulation()
+        self._emitter.particles = []
 
     def _update_canvas(self, frame):
-        if not self._is_calculated:
-            return
-
-        if not self._emitter.particles:
-            self._canvas.clear()
-            self._is_calculated = False
-            return
-
-        particles = self._emitter.particles
-        marker_positions = [np.array(p.coordinates) / self._max_coord for p in particles]
+        start_time = perf_counter()
+        if self._last_frame_time is not None:
+            self._frame_time.add(start_time - self._last_frame_time)
+        self._last_frame_time = start_time
+        self._canvas.start_frame()
+        self._drawn_frames += 1
+        if self._drawn_frames % FPS == 0:
+            self._update_hud()
+
+        return self._draw_frame(self._simulation.frames.latest())
+
+    def _draw_frame(self, frame):
+        if frame is None:
+            return self._canvas.artists
+
+        self._particles_count = len(frame)
+        self._max_coord = frame.max_coord
+        self._is_solar_mode = frame.is_solar_mode
+        if not len(frame) or not self._max_coord:
+            return self._canvas.clear()
+
+        marker_positions = frame.positions / self._max_coord
         if self._is_solar_mode:
-            marker_positions = [np.array(p) / 2.1 + 0.5 for p in marker_positions]
-        marker_sizes = [p.radius for p in particles]
-        marker_colors = [[c / 255 for c in p.color] for p in particles]
-        self._canvas.draw_markers(marker_positions,
-                                  marker_sizes, marker_colors)
-
-        print(self._emitter)
-        delta_t = 10 ** 6 if self._is_solar_mode else 1
-        method_name = self._widgets['method'].GetValue()
-        self._emitter.particles = calculate_particle_motion(method_name, particles, delta_t)
+            marker_positions = marker_positions / 2.1 + 0.5
+        return self._canvas.draw_markers(marker_positions, frame.sizes,
+                                         frame.colors, frame.style_version)
+
+    def _update_hud(self):
+        frame_time = self._frame_time.mean
+        fps = 1 / frame_time if frame_time else 0.0
+        fields = [f'frame {1000 * frame_time:.1f} ms ({fps:.1f} fps)',
+                  f'render {1000 * self._canvas.render_time.mean:.1f} ms', 'step -',
+                  f'{self._particles_count} particles', '- particle-steps/s', 'remote']
+        if hasattr(self._simulation, 'budget'):
+            budget = self._simulation.budget
+            fields[2] = f'step {1000 * self._simulation.step_time.mean:.1f} ms'
+            fields[4] = f'{self._simulation.particle_steps.rate:.3g} particle-steps/s'
+            fields[5] = (f'{budget.current_method()}: {budget.substeps}/{budget.max_substeps} '
+                         f'substeps, {budget.fps:.1f} steps/s, load {budget.load:.0%}')
+        for i, text in enumerate(fields):
+            self.SetStatusText(text, i)
+
+    def _set_view(self, max_coord, is_solar_mode):
+        self._max_coord = max_coord
+        self._is_solar_mode = is_solar_mode
+        delta_t = 10 ** 6 if is_solar_mode else 1
+        self._simulation.set_delta_t(delta_t)
+        self._simulation.set_view(max_coord, is_solar_mode)
 
     def _on_loading_click(self, event):
         self._clear()
         file_name = 'solar_system.json'
         load_data(file_name, self._emitter)
-        self._is_solar_mode = True
 
         coords = []
         for p in self._emitter.particles:
             coords.append(np.abs(p.coordinates))
-        self._max_coord = np.max(coords)
+        self._set_view(np.max(coords), True)
 
         masses = dict(enumerate([p.mass for p in self._emitter.particles]))
         sorted_keys = sorted(masses, key=masses.get)
@@ -258,16 +308,24 @@ class Form(wx.Frame):
         for i in range(len(masses)):
             key = sorted_keys.index(i)
             self._emitter.particles[i].radius = sizes[key]
+        self._simulation.set_particles(self._emitter.particles)
+        self._emitter.particles = []
 
     def _clear(self):
         self._emitter.particles = []
+        self._simulation.clear()
         self._canvas.clear()
 
     def _on_clear_click(self, event):
         self._clear()
 
     def _on_start_click(self, event):
-        self._is_calculated = True
+        self._simulation.start_simulation()
 
     def _on_stop_click(self, event):
-        self._is_calculated = False
+        self._simulation.stop_simulation()
+
+    def _on_close(self, event):
+        self.animation.event_source.stop()
+        self._simulation.shutdown()
+        event.Skip()
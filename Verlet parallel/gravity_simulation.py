@@ -1,22 +1,46 @@
 import threading
 import numpy as np
-import pyopencl as cl
 from copy import deepcopy
-from pyopencl import cltypes
 import multiprocessing as mp
-from scipy.integrate import odeint
-from verlet_cython import calculate_verlet_cython
+
+from backends import get_backend, find_cpu_devices
+from forces import GRAVITY, Gravity
+from neighbours import find_neighbour_pairs, morton_order
 
 NODES = 6
+CHUNK_SIZE = 256
+PRECISIONS = {'double': np.float64, 'single': np.float32}
+
+_opencl_programs = {}
+_opencl_lock = threading.Lock()
 
 
-def calculate_system_motion(method_name, particles, max_time, tick_count):
+def calculate_system_motion(method_name, particles, max_time, tick_count, **options):
     data = _convert_object_to_array(particles)
-    method = _select_method(method_name)
+    method = _select_method(method_name, **options)
     return method(data, max_time, tick_count)
 
 
-def calculate_particle_motion(method_name, particles, delta_t):
+def iterate_system_motion(method_name, particles, delta_t, tick_count, chunk_size=100, **options):
+    data = _convert_object_to_array(particles)
+    yield data[np.newaxis].copy()
+    yield from iterate_data_motion(method_name, data, delta_t, tick_count - 1,
+                                   chunk_size, **options)
+
+
+def iterate_data_motion(method_name, data, delta_t, steps, chunk_size=100, **options):
+    method = _select_method(method_name, **options)
+    step = 0
+    while step < steps:
+        count = min(chunk_size, steps - step)
+        chunk = method(data.copy(), (count + 1) * delta_t, count + 1)[1:]
+        data[:, :4] = chunk[-1, :, :4]
+        chunk[:, :, 4:] = data[:, 4:]
+        step += count
+        yield chunk
+
+
+def calculate_particle_motion(method_name, particles, delta_t, **options):
     if not particles:
         return []
 
@@ -36,96 +60,284 @@ def calculate_particle_motion(method_name, particles, delta_t):
         p.life_time -= 1
 
     data = _convert_object_to_array(particles)
-    method = _select_method(method_name)
+    method = _select_method(method_name, **options)
     tick_count = 2
     max_time = tick_count * delta_t
     result = method(data, max_time, tick_count)[1]
     return _convert_array_to_object(result, particles)
 
 
-def _select_method(method_name):
-    if 'sequential' in method_name:
-        method = calculate_verlet
-    elif 'threading' in method_name:
-        method = calculate_verlet_threading
-    elif 'multiprocessing' in method_name:
-        method = calculate_verlet_multiprocessing
-    elif 'cython' in method_name:
-        method = calculate_verlet_cython
-    elif 'opencl' in method_name:
-        method = calculate_verlet_opencl
-    else:
-        method = calculate_odeint
-    return method
+def _select_method(method_name, **options):
+    return get_backend(method_name, options.get('force_law')).bind(**options)
 
 
-def _calculate_acceleration(data, index, N):
-    G = 6.6743015 * (10 ** -11)
-    acc = np.array([.0, .0])
+def _calculate_acceleration(data, index, N, force_law=GRAVITY):
+    particles = data.reshape(N, NODES)
+    dist = particles[:, :2] - particles[index, :2]
+    dist2 = np.einsum('ij,ij->i', dist, dist)
+    dist2[index] = np.inf
+    factor = force_law.factor(dist2, particles[index, 5], particles[:, 5],
+                              particles[index, 4], particles[:, 4])
+    return factor @ dist
 
-    for i in range(N):
-        if i != index:
-            dist = data[NODES * i: NODES * i + 2] - data[NODES * index: NODES * index + 2]
-            # if np.linalg.norm(dist) > data[NODES * i + 4] + data[NODES * index + 4]:
-            acc += G * data[NODES * i + 5] * dist / (np.linalg.norm(dist) ** 3)
-    return acc
 
+def calculate_odeint(data, max_time, tick_count, rtol=None, atol=None, jacobian=False,
+                     force_law=GRAVITY):
+    from scipy.integrate import odeint
 
-def calculate_odeint(data, max_time, tick_count):
+    _check_jacobian(jacobian, force_law)
     shape = (tick_count, len(data), len(data[0]))
     data = data.ravel()
     init = deepcopy(data)
     delta_t = max_time / tick_count
     time_span = np.linspace(delta_t, max_time, tick_count)
-    result = odeint(_calculate_derivatives, init, time_span, args=(shape[1],))
+    jacobian = _calculate_odeint_jacobian if jacobian else None
+    result = odeint(_calculate_derivatives, init, time_span, args=(shape[1], force_law),
+                    Dfun=jacobian, rtol=rtol, atol=atol)
     return result.reshape(shape)
 
 
-def _calculate_derivatives(data, time_span, N):
-    result = np.zeros(N * NODES)
-    for i in range(N):
-        result[NODES * i: NODES * i + 2] = data[NODES * i + 2: NODES * i + 4]
-        result[NODES * i + 2: NODES * i + 4] = _calculate_acceleration(data, i, N)
-    return result
+def calculate_ivp(data, max_time, tick_count, solver='DOP853',
+                  rtol=1e-9, atol=1e-6, jacobian=False, force_law=GRAVITY):
+    from scipy.integrate import solve_ivp
+
+    _check_jacobian(jacobian, force_law)
+    shape = (tick_count, len(data), len(data[0]))
+    if tick_count == 1:
+        return data[np.newaxis].copy()
+    delta_t = max_time / tick_count
+    time_span = delta_t * np.arange(tick_count)
+    options = {'jac': _calculate_ivp_jacobian} if jacobian and solver in ('Radau', 'BDF', 'LSODA') else {}
+    solution = solve_ivp(_calculate_ivp_derivatives, (time_span[0], time_span[-1]),
+                         data.ravel(), method=solver, t_eval=time_span,
+                         args=(shape[1], force_law),
+                         rtol=rtol, atol=atol, **options)
+    if not solution.success:
+        raise RuntimeError(f'{solver} failed: {solution.message}')
+    return solution.y.T.reshape(shape)
+
+
+def _calculate_derivatives(data, time_span, N, force_law=GRAVITY):
+    data = data.reshape(N, NODES)
+    result = np.zeros((N, NODES))
+    result[:, :2] = data[:, 2:4]
+    result[:, 2:4] = _calculate_accelerations(data[:, :2], data[:, 5], data[:, 4], force_law)
+    return result.ravel()
+
+
+def _calculate_ivp_derivatives(time, data, N, force_law=GRAVITY):
+    return _calculate_derivatives(data, time, N, force_law)
+
+
+def _check_jacobian(jacobian, force_law):
+    if jacobian and (not isinstance(force_law, Gravity) or force_law.softening):
+        raise ValueError(f'Analytic jacobian is only available for plain gravity, not {force_law!r}')
+
+
+def _calculate_jacobian(data, N, force_law=GRAVITY):
+    G = force_law.G
+    data = data.reshape(N, NODES)
+    gm = G * data[:, 5]
+    dx = data[np.newaxis, :, 0] - data[:, np.newaxis, 0]
+    dy = data[np.newaxis, :, 1] - data[:, np.newaxis, 1]
+    dist2 = dx * dx + dy * dy
+    np.fill_diagonal(dist2, np.inf)
+    inv_dist3 = 1 / (dist2 * np.sqrt(dist2))
+    gm_dist3 = gm * inv_dist3
+    gm_dist5 = 3 * gm_dist3 / dist2
+
+    indices = np.arange(N)
+    jacobian = np.zeros((N, NODES, N, NODES))
+    jacobian[indices, 0, indices, 2] = 1
+    jacobian[indices, 1, indices, 3] = 1
+    jacobian[:, 2, :, 5] = G * dx * inv_dist3
+    jacobian[:, 3, :, 5] = G * dy * inv_dist3
 
+    blocks = {(0, 0): gm_dist3 - dx * dx * gm_dist5,
+              (0, 1): -dx * dy * gm_dist5,
+              (1, 0): -dx * dy * gm_dist5,
+              (1, 1): gm_dist3 - dy * dy * gm_dist5}
+    for (row, col), block in blocks.items():
+        block[indices, indices] = -block.sum(axis=1)
+        jacobian[:, row + 2, :, col] = block
+    return jacobian.reshape(N * NODES, N * NODES)
 
-def calculate_verlet(data, max_time, tick_count):
+
+def _calculate_odeint_jacobian(data, time, N, force_law=GRAVITY):
+    return _calculate_jacobian(data, N, force_law)
+
+
+def _calculate_ivp_jacobian(time, data, N, force_law=GRAVITY):
+    return _calculate_jacobian(data, N, force_law)
+
+
+def calculate_verlet(data, max_time, tick_count, force_law=GRAVITY):
     delta_t = max_time / tick_count
-    shape = (tick_count, len(data), len(data[0]))
-    size = shape[1] * shape[2]
-    data = data.ravel()
-    result = np.zeros((shape[0] * shape[1] * shape[2]))
-    result[:size] = deepcopy(data)
+    result = np.empty((tick_count, *data.shape))
+    result[0] = data
+    prev_accs = np.zeros((len(data), 2))
 
     for i in range(1, tick_count):
-        _run_verlet(data, delta_t, shape[1])
-        result[i * size: (i + 1) * size] = deepcopy(data)
-    return result.reshape(shape)
+        _run_verlet_block(result, i, delta_t, prev_accs, 0, len(data), force_law)
+    return result
 
 
-def _run_verlet(data, delta_t, N):
-    i_start = 0
-    i_end = N
-    prev_data = deepcopy(data)
-    prev_accs = np.zeros((N, 2))
-    _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N)
-    _update_speed(data, prev_accs, delta_t, i_start, i_end, N)
-    return data
+def _run_verlet_block(result, tick, delta_t, prev_accs, i_start, i_end, force_law,
+                      barrier=None):
+    N = result.shape[1]
+    prev_data = result[tick - 1].reshape(-1)
+    data = result[tick].reshape(-1)
+    data[NODES * i_start: NODES * i_end] = prev_data[NODES * i_start: NODES * i_end]
+    _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N, force_law)
+    if barrier is not None:
+        barrier.wait()
+    _update_speed(data, prev_accs, delta_t, i_start, i_end, N, force_law)
 
 
-def _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N):
+def _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N,
+                        force_law=GRAVITY):
     for i in range(i_start, i_end):
-        prev_accs[i] = _calculate_acceleration(prev_data, i, N)
+        prev_accs[i] = _calculate_acceleration(prev_data, i, N, force_law)
         data[NODES * i: NODES * i + 2] += data[NODES * i + 2: NODES * i + 4] * delta_t \
                                           + 0.5 * prev_accs[i] * delta_t ** 2
 
 
-def _update_speed(data, prev_accs, delta_t, i_start, i_end, N):
+def _update_speed(data, prev_accs, delta_t, i_start, i_end, N, force_law=GRAVITY):
     for i in range(i_start, i_end):
-        cur_acc = _calculate_acceleration(data, i, N)
+        cur_acc = _calculate_acceleration(data, i, N, force_law)
         data[NODES * i + 2: NODES * i + 4] += 0.5 * (prev_accs[i] + cur_acc) * delta_t
 
 
+def calculate_verlet_numpy(data, max_time, tick_count, precision='double', force_law=GRAVITY,
+                           reorder_every=None):
+    delta_t = max_time / tick_count
+    result = np.zeros((tick_count, *data.shape))
+    result[:] = data
+
+    verlet = NumpyVerlet(data, precision, force_law, reorder_every)
+    for i in range(1, tick_count):
+        verlet.advance(delta_t)
+        verlet.read(result[i])
+    return result
+
+
+class NumpyVerlet:
+    def __init__(self, data, precision='double', force_law=GRAVITY, reorder_every=None):
+        self.dtype = PRECISIONS[precision]
+        self.force_law = force_law
+        self.reorder_every = reorder_every
+        self.order = None
+        self.steps = 0
+        self.origin = data[:, :2].mean(axis=0)
+        self.positions = (data[:, :2] - self.origin).astype(self.dtype)
+        self.speeds = data[:, 2:4].astype(self.dtype)
+        self.masses = data[:, 5].astype(self.dtype)
+        self.radii = data[:, 4].astype(self.dtype)
+        compensated = self.dtype != np.float64
+        self.positions_error = np.zeros_like(self.positions) if compensated else None
+        self.speeds_error = np.zeros_like(self.speeds) if compensated else None
+        self._increment = np.empty_like(self.positions)
+        self._scratch = np.empty_like(self.positions)
+        self._state = np.empty((len(data), 2))
+        self.accs = None
+        if reorder_every:
+            self.reorder()
+        self.accs = self._calculate_accelerations()
+
+    def advance(self, delta_t, steps=1):
+        dtype = self.dtype
+        for i in range(steps):
+            if self.reorder_every and self.steps and self.steps % self.reorder_every == 0:
+                self.reorder()
+            increment, scratch = self._increment, self._scratch
+            np.multiply(self.speeds, dtype(delta_t), out=increment)
+            np.multiply(self.accs, dtype(0.5 * delta_t ** 2), out=scratch)
+            increment += scratch
+            _compensated_add(self.positions, self.positions_error, increment, scratch)
+            cur_accs = self._calculate_accelerations()
+            np.add(self.accs, cur_accs, out=increment)
+            increment *= dtype(0.5 * delta_t)
+            _compensated_add(self.speeds, self.speeds_error, increment, scratch)
+            self.accs = cur_accs
+            self.steps += 1
+
+    def reorder(self):
+        permutation = morton_order(self.positions)
+        self.order = permutation if self.order is None else self.order[permutation]
+        for name in ('positions', 'speeds', 'masses', 'radii',
+                     'positions_error', 'speeds_error', 'accs'):
+            values = getattr(self, name)
+            if values is not None:
+                setattr(self, name, values[permutation])
+
+    def read(self, data):
+        index = slice(None) if self.order is None else self.order
+        state = _compensated_value(self.positions, self.positions_error, self._state)
+        for k in range(2):
+            state[:, k] += self.origin[k]
+        data[index, :2] = state
+        data[index, 2:4] = _compensated_value(self.speeds, self.speeds_error, state)
+        return data
+
+    def _calculate_accelerations(self):
+        return _calculate_accelerations(self.positions, self.masses, self.radii, self.force_law)
+
+
+def _calculate_accelerations(positions, masses, radii=None, force_law=GRAVITY,
+                             chunk_size=CHUNK_SIZE):
+    if radii is None:
+        radii = np.zeros_like(masses)
+    cutoff = force_law.cutoff_for(radii)
+    if cutoff is not None:
+        return _calculate_neighbour_accelerations(positions, masses, radii, force_law, cutoff)
+
+    dtype = positions.dtype
+    N = len(positions)
+    x = positions[:, 0].copy()
+    y = positions[:, 1].copy()
+    accs = np.empty((N, 2), dtype=dtype)
+
+    for start in range(0, N, chunk_size):
+        end = min(start + chunk_size, N)
+        dx = x[np.newaxis, :] - x[start:end, np.newaxis]
+        dy = y[np.newaxis, :] - y[start:end, np.newaxis]
+        dist2 = dx * dx + dy * dy
+        dist2[np.arange(end - start), np.arange(start, end)] = np.inf
+        factor = force_law.factor(dist2, masses[start:end, np.newaxis], masses,
+                                  radii[start:end, np.newaxis], radii)
+        accs[start:end, 0] = np.sum(factor * dx, axis=1)
+        accs[start:end, 1] = np.sum(factor * dy, axis=1)
+    return accs
+
+
+def _calculate_neighbour_accelerations(positions, masses, radii, force_law, cutoff):
+    N = len(positions)
+    first, second, dist, dist2 = find_neighbour_pairs(positions, cutoff)
+    factor = force_law.factor(dist2, masses[first], masses[second], radii[first], radii[second])
+    accs = np.empty((N, 2), dtype=positions.dtype)
+    accs[:, 0] = np.bincount(first, factor * dist[:, 0], minlength=N)
+    accs[:, 1] = np.bincount(first, factor * dist[:, 1], minlength=N)
+    return accs
+
+
+def _compensated_add(values, errors, increment, total):
+    if errors is None:
+        values += increment
+        return
+    increment -= errors
+    np.add(values, increment, out=total)
+    np.subtract(total, values, out=errors)
+    errors -= increment
+    values[:] = total
+
+
+def _compensated_value(values, errors, out):
+    out[:] = values
+    if errors is not None:
+        out -= errors
+    return out
+
+
 def _convert_object_to_array(particles):
     data = []
     for p in particles:
@@ -144,240 +356,282 @@ def _convert_array_to_object(data, particles):
     return particles
 
 
-def calculate_verlet_threading(data, max_time, tick_count, threads_count=4):
+def calculate_verlet_threading(data, max_time, tick_count, threads_count=4, force_law=GRAVITY):
     block = len(data) // threads_count
-    shape = (tick_count, len(data), len(data[0]))
-    size = shape[1] * shape[2]
-    data = data.ravel()
-    result = np.zeros((shape[0] * size))
-    result[:size] = deepcopy(data)
+    result = np.empty((tick_count, *data.shape))
+    result[0] = data
     barrier = threading.Barrier(threads_count)
 
     threads = []
     for i in range(threads_count):
         i_start = i * block
-        i_end = (i + 1) * block if i < threads_count - 1 else shape[1]
-        args = [data, max_time, tick_count, result,
-                barrier, i_start, i_end, size, shape[1]]
+        i_end = (i + 1) * block if i < threads_count - 1 else len(data)
+        args = [result, max_time, barrier, i_start, i_end, force_law]
         thread = threading.Thread(target=_run_threading, args=(*args,))
         threads.append(thread)
         thread.start()
 
     for thread in threads:
         thread.join()
-    return result.reshape(shape)
+    return result
 
 
-def _run_threading(data, max_time, tick_count, result,
-                   barrier, i_start, i_end, size, N):
+def _run_threading(result, max_time, barrier, i_start, i_end, force_law):
+    tick_count = len(result)
     delta_t = max_time / tick_count
+    prev_accs = np.zeros((result.shape[1], 2))
     for i in range(1, tick_count):
-        _update_particles_threading(data, delta_t, barrier, i_start, i_end, N)
-        result[i * size: (i + 1) * size] = deepcopy(data)
-
-
-def _update_particles_threading(data, delta_t, barrier, i_start, i_end, N):
-    prev_data = deepcopy(data)
-    prev_accs = np.zeros((len(data), 2))
-    barrier.wait()
-    _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N)
-    barrier.wait()
-    _update_speed(data, prev_accs, delta_t, i_start, i_end, N)
+        _run_verlet_block(result, i, delta_t, prev_accs, i_start, i_end, force_law, barrier)
 
 
-def calculate_verlet_multiprocessing(data, max_time, tick_count):
-    processes_count = mp.cpu_count()
+def calculate_verlet_multiprocessing(data, max_time, tick_count, threads_count=None,
+                                     force_law=GRAVITY):
+    processes_count = threads_count or mp.cpu_count()
     block = len(data) // processes_count
-    shape = (tick_count, len(data), len(data[0]))
-    size = shape[1] * shape[2]
-    data = data.ravel()
-    shared_data = mp.Array('d', np.zeros(size))
-    result = mp.Array('d', np.zeros(shape[0] * size))
-    result[:size] = deepcopy(data)
+    shape = (tick_count, *data.shape)
+    shared_result = mp.RawArray('d', tick_count * data.size)
+    result = np.frombuffer(shared_result).reshape(shape)
+    result[0] = data
     barrier = mp.Barrier(processes_count)
-    queue = mp.Queue()
 
     processes = []
     for i in range(processes_count):
         i_start = i * block
-        i_end = (i + 1) * block if i < processes_count - 1 else shape[1]
-        args = [data, max_time, tick_count, result, shared_data, barrier,
-                queue, processes_count, i_start, i_end, size, shape[1]]
+        i_end = (i + 1) * block if i < processes_count - 1 else len(data)
+        args = [shared_result, shape, max_time, barrier, i_start, i_end, force_law]
         process = mp.Process(target=_run_multiprocessing, args=(*args,))
         processes.append(process)
         process.start()
 
     for process in processes:
         process.join()
-    return np.frombuffer(result.get_obj()).reshape(shape)
+    return result
 
 
-def _run_multiprocessing(data, max_time, tick_count, result, shared_data,
-                         barrier, queue, processes_count, i_start, i_end, size, N):
-    delta_t = max_time / tick_count
-    for i in range(1, tick_count):
-        _update_particles_multiprocessing(data, delta_t, shared_data, barrier,
-                                          queue, processes_count, i_start, i_end, N)
-        result[i * size: (i + 1) * size] = deepcopy(data)
-
-
-def _update_particles_multiprocessing(data, delta_t, shared_data, barrier,
-                                      queue, processes_count, i_start, i_end, N):
-    prev_data = deepcopy(data)
-    prev_accs = np.zeros((N, 2))
-    _update_coordinates(data, prev_data, prev_accs, delta_t, i_start, i_end, N)
-    _exchange_data_multiprocessing(data, shared_data, barrier, queue,
-                                   processes_count, i_start, i_end)
-    _update_speed(data, prev_accs, delta_t, i_start, i_end, N)
-    _exchange_data_multiprocessing(data, shared_data, barrier, queue,
-                                   processes_count, i_start, i_end)
-
-
-def _exchange_data_multiprocessing(data, shared_data, barrier, queue,
-                                   processes_count, i_start, i_end):
-    queue.put([NODES * i_start, NODES * i_end,
-               data[NODES * i_start: NODES * i_end]])
-    barrier.wait()
-
-    if i_start == 0:
-        for i in range(processes_count):
-            temp = queue.get()
-            shared_data[temp[0]: temp[1]] = temp[2]
-    barrier.wait()
-    data[:] = np.frombuffer(shared_data.get_obj())
-
-
-def calculate_verlet_opencl(data, max_time, tick_count):
+def _run_multiprocessing(shared_result, shape, max_time, barrier, i_start, i_end, force_law):
+    result = np.frombuffer(shared_result).reshape(shape)
+    _run_threading(result, max_time, barrier, i_start, i_end, force_law)
+
+
+def calculate_verlet_opencl(data, max_time, tick_count, precision='double', force_law=GRAVITY):
+    import pyopencl as cl
+
+    dtype = PRECISIONS[precision]
     N = np.array(len(data))
     M = np.array(tick_count)
     nodes = np.array(NODES)
     delta_t = max_time / tick_count
-    delta_t = np.array(delta_t)
+    delta_t = np.array(delta_t, dtype=dtype)
 
-    platform = cl.get_platforms()
-    devices = platform[0].get_devices(device_type=cl.device_type.CPU)
-    ctx = cl.Context(devices=devices)
-    queue = cl.CommandQueue(ctx)
+    ctx, queue, kernel = _build_opencl_program(dtype, force_law)
 
-    prev_data = np.array(data, dtype=cltypes.double)
-    cur_data = deepcopy(prev_data)
-    result = np.zeros((M, N, NODES), dtype=cltypes.double)
-    prev_accs = np.zeros((N, 2), dtype=cltypes.double)
-    cur_accs = np.zeros((N, 2), dtype=cltypes.double)
+    origin = data[:, :2].mean(axis=0)
+    cur_data = np.array(data, dtype=dtype)
+    cur_data[:, :2] = data[:, :2] - origin
+    compensated = dtype != np.float64
+    errors = np.zeros((N, 4), dtype=dtype)
+    result = np.empty((M, N, NODES), dtype=dtype)
+    result_errors = np.empty((M, N, 4) if compensated else 1, dtype=dtype)
+    prev_accs = np.zeros((N, 2), dtype=dtype)
+    cur_accs = np.zeros((N, 2), dtype=dtype)
 
     mf = cl.mem_flags
     M_buff = cl.Buffer(ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=M)
     N_buff = cl.Buffer(ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=N)
     nodes_buff = cl.Buffer(ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=nodes)
     delta_t_buff = cl.Buffer(ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=delta_t)
-    prev_data_buff = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=prev_data)
     cur_data_buff = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=cur_data)
+    errors_buff = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=errors)
     prev_accs_buff = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=prev_accs)
     cur_accs_buff = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=cur_accs)
     result_buff = cl.Buffer(ctx, mf.WRITE_ONLY, result.nbytes)
+    result_errors_buff = cl.Buffer(ctx, mf.WRITE_ONLY, result_errors.nbytes)
+
+    with _opencl_lock:
+        kernel(queue, (1,), None, cur_data_buff, errors_buff,
+               prev_accs_buff, cur_accs_buff, result_buff, result_errors_buff,
+               delta_t_buff, M_buff, N_buff, nodes_buff)
+    cl.enqueue_copy(queue, result, result_buff)
+    if compensated:
+        cl.enqueue_copy(queue, result_errors, result_errors_buff)
+    queue.finish()
+
+    result = result.astype(np.float64, copy=False)
+    if compensated:
+        result[:, :, :4] -= result_errors
+    for k in range(2):
+        result[:, :, k] += origin[k]
+    result[:, :, 4:] = data[:, 4:]
+    return result
 
+
+def _build_opencl_program(dtype, force_law):
+    import pyopencl as cl
+
+    key = (np.dtype(dtype).name, force_law.kernel_parameters())
+    with _opencl_lock:
+        if key not in _opencl_programs:
+            _opencl_programs[key] = _compile_opencl_program(cl, dtype, force_law)
+        return _opencl_programs[key]
+
+
+def _compile_opencl_program(cl, dtype, force_law):
+    ctx = cl.Context(devices=find_cpu_devices())
+    queue = cl.CommandQueue(ctx)
     source = """
              #pragma OPENCL EXTENSION cl_khr_fp64 : enable
+             typedef REAL real;
 
-             double calculate_norm(__global double *data, int nodes, int i, int j)
+             void compensated_add(__global real *values, __global real *errors,
+                                  int value_index, int error_index, real increment)
              {
-                 double temp = 0;
+             #if COMPENSATED
+                 real term = increment - errors[error_index];
+                 real total = values[value_index] + term;
+                 errors[error_index] = (total - values[value_index]) - term;
+                 values[value_index] = total;
+             #else
+                 values[value_index] += increment;
+             #endif
+             }
+
+             real pair_factor(__global real *data, int nodes, int i, int index)
+             {
+                 real dist2 = 0;
                  for (int k = 0; k < 2; ++k)
-                     temp += pow((data[nodes * i + k] - data[nodes * j + k]), 2);
-                 return sqrt(temp);
+                 {
+                     real dist = data[nodes * i + k] - data[nodes * index + k];
+                     dist2 += dist * dist;
+                 }
+             #if FORCE_LAW == 0
+                 dist2 += (real) LAW_B;
+                 real norm = sqrt(dist2);
+                 return (real) LAW_A * data[nodes * i + 5] / dist2 / norm;
+             #elif FORCE_LAW == 1
+                 if (dist2 >= (real) LAW_CUTOFF2)
+                     return 0;
+                 real ratio2 = (real) LAW_B / dist2;
+                 real ratio6 = ratio2 * ratio2 * ratio2;
+                 return (real) (-24 * LAW_A) * (2 * ratio6 * ratio6 - ratio6)
+                        / (dist2 * data[nodes * index + 5]);
+             #else
+                 real norm = sqrt(dist2);
+                 real overlap = data[nodes * i + 4] + data[nodes * index + 4] - norm;
+                 if (overlap <= 0)
+                     return 0;
+                 return (real) (-LAW_A) * overlap / (norm * data[nodes * index + 5]);
+             #endif
              }
 
-             void calculate_acceleration(__global double *data, __global double *accs,
+             void calculate_acceleration(__global real *data, __global real *accs,
                                          int N, int nodes, int index)
              {
-                 double G = 6.6743015 * pow(10.0, -11);
-
-                 for (int k = 0; k < 2; ++k)
-                     accs[2 * index + k] = 0;
+                 real sums[2] = {0, 0};
+                 real errors[2] = {0, 0};
 
                  for (int i = 0; i < N; ++i)
                  {
                      if (i != index)
                      {
+                         real factor = pair_factor(data, nodes, i, index);
                          for (int k = 0; k < 2; ++k)
                          {
-                             double dist = data[nodes * i + k] - data[nodes * index + k];
-                             double norm = calculate_norm(data, nodes, i, index);
-                             accs[2 * index + k] += G * data[nodes * i + 5] * dist / pow(norm, 3);
+                             real dist = data[nodes * i + k] - data[nodes * index + k];
+                             real term = factor * dist - errors[k];
+                             real total = sums[k] + term;
+                             errors[k] = (total - sums[k]) - term;
+                             sums[k] = total;
                          }
                      }
                  }
+
+                 for (int k = 0; k < 2; ++k)
+                     accs[2 * index + k] = sums[k];
              }
 
-             void update_coordinates(__global double *prev_data, __global double *cur_data,
-                                     __global double *accs, double delta_t, int N, int nodes)
+             void update_coordinates(__global real *cur_data, __global real *errors,
+                                     __global real *accs, real delta_t, int N, int nodes)
              {
                  for (int j = 0; j < N; ++j)
                  {
                      for (int k = 0; k < 2; ++k)
                      {
-                         cur_data[nodes * j + k] += prev_data[nodes * j + k + 2] * delta_t
-                                                    + 0.5 * accs[2 * j + k] * pow(delta_t, 2);
+                         real increment = cur_data[nodes * j + k + 2] * delta_t
+                                          + (real) 0.5 * accs[2 * j + k] * delta_t * delta_t;
+                         compensated_add(cur_data, errors, nodes * j + k, 4 * j + k, increment);
                      }
                  }
              }
 
-             void update_speed(__global double *cur_data, __global double *prev_accs,
-                               __global double *cur_accs, double delta_t, int N, int nodes)
+             void update_speed(__global real *cur_data, __global real *errors,
+                               __global real *prev_accs, __global real *cur_accs,
+                               real delta_t, int N, int nodes)
              {
                  for (int j = 0; j < N; ++j)
                  {
                      for (int k = 0; k < 2; ++k)
                      {
-                         double accs_sum = prev_accs[2 * j + k] + cur_accs[2 * j + k]; 
-                         cur_data[nodes * j + k + 2] += 0.5 * accs_sum * delta_t;
+                         real accs_sum = prev_accs[2 * j + k] + cur_accs[2 * j + k];
+                         compensated_add(cur_data, errors, nodes * j + k + 2, 4 * j + k + 2,
+                                         (real) 0.5 * accs_sum * delta_t);
                      }
                  }
              }
 
-             __kernel void verlet_opencl(__global double *prev_data, __global double *cur_data,
-                                         __global double *prev_accs, __global double *cur_accs,
-                                         __global double *result, __global double *delta_t_buff,
-                                         __global int *M_buff, __global int *N_buff, __global int *nodes_buff)
+             __kernel void verlet_opencl(__global real *cur_data, __global real *errors,
+                                         __global real *prev_accs, __global real *cur_accs,
+                                         __global real *result, __global real *result_errors,
+                                         __global real *delta_t_buff, __global int *M_buff,
+                                         __global int *N_buff, __global int *nodes_buff)
              {
                  int M = *M_buff;
                  int N = *N_buff;
                  int nodes = *nodes_buff;
-                 double delta_t = *delta_t_buff;
+                 real delta_t = *delta_t_buff;
 
                  for (int j = 0; j < N; ++j)
+                 {
+                     for (int k = 0; k < nodes; ++k)
+                         result[nodes * j + k] = cur_data[nodes * j + k];
+             #if COMPENSATED
                      for (int k = 0; k < 4; ++k)
-                         result[nodes * j + k] = prev_data[nodes * j + k];
+                         result_errors[4 * j + k] = 0;
+             #endif
+                 }
+
+                 for (int j = 0; j < N; ++j)
+                     calculate_acceleration(cur_data, prev_accs, N, nodes, j);
 
                  for (int i = 1; i < M; ++i)
                  {
-                     for (int j = 0; j < N; ++j)
-                         calculate_acceleration(prev_data, prev_accs, N, nodes, j);
-
-                     update_coordinates(prev_data, cur_data, prev_accs, delta_t, N, nodes);
+                     update_coordinates(cur_data, errors, prev_accs, delta_t, N, nodes);
 
                      for (int j = 0; j < N; ++j)
                          calculate_acceleration(cur_data, cur_accs, N, nodes, j);
 
-                     update_speed(cur_data, prev_accs, cur_accs, delta_t, N, nodes);
+                     update_speed(cur_data, errors, prev_accs, cur_accs, delta_t, N, nodes);
+
+                     __global real *accs = prev_accs;
+                     prev_accs = cur_accs;
+                     cur_accs = accs;
 
                      for (int j = 0; j < N; ++j)
                      {
-                         for (int k = 0; k < 2; ++k)
-                         {
-                             prev_data[nodes * j + k] = cur_data[nodes * j + k];
-                             prev_data[nodes * j + k + 2] = cur_data[nodes * j + k + 2];
-                             prev_accs[2 * j + k] = cur_accs[2 * j + k];
+                         for (int k = 0; k < nodes; ++k)
                              result[nodes * (N * i + j) + k] = cur_data[nodes * j + k];
-                             result[nodes * (N * i + j) + k + 2] = cur_data[nodes * j + k + 2];
-                         }
+             #if COMPENSATED
+                         for (int k = 0; k < 4; ++k)
+                             result_errors[4 * (N * i + j) + k] = errors[4 * j + k];
+             #endif
                      }
                  }
              }"""
 
+    compensated = int(dtype != np.float64)
+    law_code, law_a, law_b, law_cutoff2 = force_law.kernel_parameters()
+    options = [f'-DREAL={"double" if dtype == np.float64 else "float"}',
+               f'-DCOMPENSATED={compensated}', f'-DFORCE_LAW={law_code}',
+               f'-DLAW_A={law_a!r}', f'-DLAW_B={law_b!r}', f'-DLAW_CUTOFF2={law_cutoff2!r}']
     program = cl.Program(ctx, source)
-    program.build()
-    program.verlet_opencl(queue, (1,), None, prev_data_buff, cur_data_buff, prev_accs_buff,
-                          cur_accs_buff, result_buff, delta_t_buff, M_buff, N_buff, nodes_buff)
-    cl.enqueue_copy(queue, result, result_buff).wait()
-    return result
+    program.build(options=options)
+    return ctx, queue, cl.Kernel(program, 'verlet_opencl')
@@ -1,8 +1,20 @@
 import wx
+import argparse
 from form import Form
+from client import RemoteSimulation
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Particle system viewer')
+    parser.add_argument('--connect', default=None,
+                        help='attach to a simulation server at host:port or unix:/path')
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = _parse_args()
+    simulation = RemoteSimulation(args.connect) if args.connect else None
     app = wx.App()
-    form = Form(parent=None, id=-1, title="Particle system")
+    form = Form(parent=None, id=-1, title="Particle system", simulation=simulation)
     app.SetTopWindow(form)
     app.MainLoop()
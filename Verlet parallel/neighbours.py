@@ -0,0 +1,84 @@
+import numpy as np
+
+OFFSETS = [(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+MORTON_BITS = 21
+
+
+class CellList:
+    def __init__(self, positions, cutoff):
+        self.cutoff = cutoff
+        lower = positions.min(axis=0)
+        cells = np.floor((positions - lower) / cutoff).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1
+        keys = interleave_bits(cells[:, 0], cells[:, 1])
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        self.keys, self.starts, counts = np.unique(sorted_keys, return_index=True,
+                                                   return_counts=True)
+        self.ends = self.starts + counts
+        self.cells = cells
+
+    def pairs(self):
+        first = []
+        second = []
+        indices = np.arange(len(self.cells))
+        for offset in OFFSETS:
+            neighbour = self.cells + offset
+            inside = np.all((neighbour >= 0) & (neighbour < self.shape), axis=1)
+            keys = interleave_bits(neighbour[inside, 0], neighbour[inside, 1])
+            slots = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            occupied = self.keys[slots] == keys
+            owners = indices[inside][occupied]
+            slots = slots[occupied]
+            starts = self.starts[slots]
+            counts = self.ends[slots] - starts
+            total = counts.sum()
+            if not total:
+                continue
+            owners = np.repeat(owners, counts)
+            shifts = np.repeat(np.cumsum(counts) - counts, counts)
+            members = self.order[np.repeat(starts, counts) + np.arange(total) - shifts]
+            first.append(owners)
+            second.append(members)
+
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+        distinct = first != second
+        return first[distinct], second[distinct]
+
+
+def find_neighbour_pairs(positions, cutoff):
+    if cutoff <= 0 or not len(positions):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros((0, 2), dtype=positions.dtype), np.zeros(0, dtype=positions.dtype)
+    first, second = CellList(positions, cutoff).pairs()
+    dist = positions[second] - positions[first]
+    dist2 = np.einsum('ij,ij->i', dist, dist)
+    close = dist2 < cutoff ** 2
+    return first[close], second[close], dist[close], dist2[close]
+
+
+def morton_keys(positions, bits=MORTON_BITS):
+    lower = positions.min(axis=0)
+    span = max(float(np.max(positions.max(axis=0) - lower)), np.finfo(float).tiny)
+    cells = ((positions - lower) * ((2 ** bits - 1) / span)).astype(np.int64)
+    return interleave_bits(cells[:, 0], cells[:, 1])
+
+
+def morton_order(positions, bits=MORTON_BITS):
+    return np.argsort(morton_keys(positions, bits), kind='stable')
+
+
+def interleave_bits(x, y):
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def _spread_bits(values):
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                        (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
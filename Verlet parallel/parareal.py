@@ -0,0 +1,110 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from forces import GRAVITY
+from backends import get_backend
+from gravity_simulation import NumpyVerlet
+
+TOLERANCE = 1e-6
+COARSE_RATIO = 10
+SLICES_PER_PROCESS = 2
+
+
+def calculate_parareal(data, max_time, tick_count, slices_count=None,
+                       coarse_ratio=COARSE_RATIO, tolerance=TOLERANCE, max_iterations=None,
+                       fine_method='verlet_numpy', processes_count=None, force_law=GRAVITY):
+    parareal = Parareal(fine_method, slices_count, coarse_ratio, tolerance, max_iterations,
+                        processes_count, force_law)
+    return parareal.calculate(data, max_time, tick_count)
+
+
+class Parareal:
+    def __init__(self, fine_method='verlet_numpy', slices_count=None,
+                 coarse_ratio=COARSE_RATIO, tolerance=TOLERANCE, max_iterations=None,
+                 processes_count=None, force_law=GRAVITY):
+        self.fine_method = fine_method
+        self.coarse_ratio = coarse_ratio
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.processes_count = processes_count or os.cpu_count() or 1
+        self.slices_count = slices_count or SLICES_PER_PROCESS * self.processes_count
+        self.force_law = force_law
+        self.iterations = 0
+        self.changes = []
+
+    def calculate(self, data, max_time, tick_count):
+        delta_t = max_time / tick_count
+        result = np.empty((tick_count, *data.shape))
+        result[0] = data
+        bounds = _slice_bounds(tick_count - 1, self.slices_count)
+        steps = np.diff(bounds)
+        slices_count = len(steps)
+
+        states = [data.copy()]
+        coarse = []
+        for i in range(slices_count):
+            coarse.append(self._coarse(states[i], delta_t, steps[i]))
+            states.append(coarse[i].copy())
+
+        self.iterations = 0
+        self.changes = []
+        max_iterations = min(self.max_iterations or slices_count, slices_count)
+        executor = None
+        if self.processes_count > 1 and slices_count > 1:
+            executor = ProcessPoolExecutor(min(self.processes_count, slices_count))
+        try:
+            for iteration in range(max_iterations):
+                fine_ends = {}
+                pending = range(iteration, slices_count)
+                trajectories = self._fine(executor, [(states[i], delta_t, steps[i])
+                                                     for i in pending])
+                for i, trajectory in zip(pending, trajectories):
+                    result[bounds[i]: bounds[i + 1] + 1] = trajectory
+                    fine_ends[i] = trajectory[-1].copy()
+
+                change = 0.0
+                for i in pending:
+                    corrected = self._coarse(states[i], delta_t, steps[i])
+                    state = corrected + fine_ends[i] - coarse[i]
+                    change = max(change, _relative_change(state, states[i + 1]))
+                    coarse[i] = corrected
+                    states[i + 1] = state
+
+                self.iterations = iteration + 1
+                self.changes.append(change)
+                if change <= self.tolerance:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return result
+
+    def _coarse(self, state, delta_t, steps):
+        coarse_steps = max(1, int(np.ceil(steps / self.coarse_ratio)))
+        verlet = NumpyVerlet(state, force_law=self.force_law)
+        verlet.advance(steps * delta_t / coarse_steps, coarse_steps)
+        return verlet.read(state.copy())
+
+    def _fine(self, executor, tasks):
+        arguments = [(self.fine_method, state, delta_t, steps, self.force_law)
+                     for state, delta_t, steps in tasks]
+        if executor is None:
+            return [_propagate_fine(*task) for task in arguments]
+        return list(executor.map(_propagate_fine, *zip(*arguments)))
+
+
+def _propagate_fine(method_name, state, delta_t, steps, force_law):
+    method = get_backend(method_name, force_law).bind(force_law=force_law)
+    return method(state, (steps + 1) * delta_t, steps + 1)
+
+
+def _slice_bounds(steps, slices_count):
+    slices_count = max(1, min(slices_count, steps))
+    return np.unique(np.linspace(0, steps, slices_count + 1).astype(int))
+
+
+def _relative_change(state, previous):
+    scale = np.abs(previous[:, :4]).max(axis=0)
+    scale[scale == 0] = 1
+    return np.max(np.abs(state[:, :4] - previous[:, :4]) / scale)
@@ -0,0 +1,143 @@
+import json
+import zlib
+import struct
+import numpy as np
+
+from particle import Particle
+
+KEYFRAME = 0
+DELTA = 1
+STYLE = 2
+COMMAND = 3
+
+HEADER = struct.Struct('<BIII')
+VIEW = struct.Struct('<d?')
+COMPRESSION_LEVEL = 1
+
+
+class Packet:
+    def __init__(self, index, base_index, style_version, keyframe, delta, style):
+        self.index = index
+        self.base_index = base_index
+        self.style_version = style_version
+        self.keyframe = keyframe
+        self.delta = delta
+        self.style = style
+
+
+class FrameEncoder:
+    def __init__(self, delta_encoding=True):
+        self.delta_encoding = delta_encoding
+        self._previous = None
+        self._previous_index = None
+        self._style_version = None
+        self._style = None
+
+    def encode(self, frame):
+        indices = frame.indices
+        positions = np.ascontiguousarray(frame.positions, dtype=np.float32)
+        if self._style_version != frame.style_version:
+            self._style = _encode_style(frame)
+            self._style_version = frame.style_version
+            self._previous = None
+
+        mask = np.zeros(indices[-1] + 1 if len(indices) else 0, dtype=bool)
+        mask[indices] = True
+        keyframe = zlib.compress(struct.pack('<I', len(mask)) + np.packbits(mask).tobytes()
+                                 + positions.tobytes(), COMPRESSION_LEVEL)
+        delta = None
+        if self.delta_encoding and self._previous is not None:
+            bits = positions.view(np.uint32) ^ self._previous.view(np.uint32)
+            delta = zlib.compress(bits.tobytes(), COMPRESSION_LEVEL)
+        packet = Packet(frame.index, self._previous_index, frame.style_version,
+                        keyframe, delta, self._style)
+        self._previous = positions
+        self._previous_index = frame.index
+        return packet
+
+
+class FrameDecoder:
+    def __init__(self):
+        self.positions = None
+        self.indices = None
+        self.sizes = np.zeros(0)
+        self.colors = np.zeros((0, 3))
+        self.max_coord = 0.0
+        self.is_solar_mode = False
+
+    def decode(self, kind, payload):
+        payload = zlib.decompress(payload)
+        if kind == STYLE:
+            self.max_coord, self.is_solar_mode = VIEW.unpack_from(payload)
+            count = (len(payload) - VIEW.size) // 16
+            style = np.frombuffer(payload, dtype=np.float32, offset=VIEW.size)
+            self.sizes = style[:count].astype(np.float64)
+            self.colors = style[count:].reshape(count, 3).astype(np.float64)
+            return
+        if kind == KEYFRAME:
+            mask_size, = struct.unpack_from('<I', payload)
+            mask_bytes = (mask_size + 7) // 8
+            mask = np.unpackbits(np.frombuffer(payload, dtype=np.uint8, count=mask_bytes,
+                                               offset=4), count=mask_size).astype(bool)
+            self.indices = np.flatnonzero(mask)
+            self.positions = np.frombuffer(payload, dtype=np.float32,
+                                           offset=4 + mask_bytes).reshape(-1, 2).copy()
+        elif kind == DELTA:
+            bits = self.positions.view(np.uint32).ravel() ^ np.frombuffer(payload, dtype=np.uint32)
+            self.positions = bits.view(np.float32).reshape(-1, 2)
+        return self.positions.astype(np.float64)
+
+
+def _encode_style(frame):
+    style = np.concatenate([np.asarray(frame.sizes, dtype=np.float32).ravel(),
+                            np.asarray(frame.colors, dtype=np.float32).ravel()])
+    view = VIEW.pack(frame.max_coord, frame.is_solar_mode)
+    return zlib.compress(view + style.tobytes(), COMPRESSION_LEVEL)
+
+
+def pack_message(kind, payload, index=0, style_version=0):
+    return HEADER.pack(kind, index, style_version, len(payload)) + payload
+
+
+def unpack_header(header):
+    return HEADER.unpack(header)
+
+
+def pack_command(command, payload=None):
+    if command in ('set', 'add'):
+        particles = payload if command == 'set' else [payload]
+        payload = [particle_to_dict(p) for p in particles]
+    return pack_message(COMMAND, json.dumps({'command': command,
+                                             'payload': payload}).encode())
+
+
+def unpack_command(payload):
+    message = json.loads(payload.decode())
+    command, payload = message['command'], message['payload']
+    if command == 'set':
+        payload = [particle_from_dict(p) for p in payload]
+    elif command == 'add':
+        payload = particle_from_dict(payload[0])
+    return command, payload
+
+
+def particle_to_dict(particle):
+    return {'coordinates': [float(c) for c in particle.coordinates],
+            'speed': [float(s) for s in particle.speed],
+            'mass': float(particle.mass), 'radius': float(particle.radius),
+            'color': [float(c) for c in tuple(particle.color)[:3]],
+            'life_time': int(particle.life_time)}
+
+
+def particle_from_dict(data):
+    particle = Particle(np.array(data['coordinates']), np.array(data['speed']),
+                        data['mass'], data['color'], data['life_time'])
+    particle.radius = data['radius']
+    return particle
+
+
+def parse_address(address):
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import argparse
+
+from simulation_thread import SimulationThread
+from protocol import (FrameEncoder, KEYFRAME, DELTA, STYLE, COMMAND, HEADER,
+                      pack_message, unpack_header, unpack_command, parse_address)
+
+FPS = 25
+CLIENT_QUEUE_SIZE = 4
+COMMANDS = ('start', 'stop', 'clear', 'set', 'add', 'method', 'delta_t', 'view')
+
+
+class Subscriber:
+    def __init__(self, writer, queue_size=CLIENT_QUEUE_SIZE):
+        self.writer = writer
+        self.packets = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._last_index = None
+        self._style_version = None
+
+    def offer(self, packet):
+        if self.packets.full():
+            self.packets.get_nowait()
+            self.dropped += 1
+        self.packets.put_nowait(packet)
+
+    async def send_packets(self):
+        while True:
+            packet = await self.packets.get()
+            if self._style_version != packet.style_version:
+                self.writer.write(pack_message(STYLE, packet.style, packet.index,
+                                               packet.style_version))
+                self._style_version = packet.style_version
+            if packet.delta is not None and packet.base_index == self._last_index:
+                message = pack_message(DELTA, packet.delta, packet.index, packet.style_version)
+            else:
+                message = pack_message(KEYFRAME, packet.keyframe, packet.index,
+                                       packet.style_version)
+            self.writer.write(message)
+            self._last_index = packet.index
+            await self.writer.drain()
+
+
+class SimulationServer:
+    def __init__(self, method_name, address, delta_encoding=True,
+                 queue_size=CLIENT_QUEUE_SIZE, fps=FPS):
+        self.address = address
+        self.simulation = SimulationThread(method_name)
+        self._encoder = FrameEncoder(delta_encoding)
+        self._queue_size = queue_size
+        self._interval = 1 / fps
+        self._subscribers = set()
+        self._last_packet = None
+
+    async def serve(self):
+        self.simulation.start()
+        kind, address = parse_address(self.address)
+        if kind == 'unix':
+            if os.path.exists(address):
+                os.remove(address)
+            server = await asyncio.start_unix_server(self._on_client, path=address)
+        else:
+            server = await asyncio.start_server(self._on_client, *address)
+        try:
+            async with server:
+                await self._publish_frames()
+        finally:
+            self.simulation.shutdown()
+            if kind == 'unix' and os.path.exists(address):
+                os.remove(address)
+
+    async def _publish_frames(self):
+        while True:
+            frame = self.simulation.frames.latest()
+            if frame is not None:
+                self._last_packet = self._encoder.encode(frame)
+                for subscriber in self._subscribers:
+                    subscriber.offer(self._last_packet)
+            await asyncio.sleep(self._interval)
+
+    async def _on_client(self, reader, writer):
+        subscriber = Subscriber(writer, self._queue_size)
+        if self._last_packet is not None:
+            subscriber.offer(self._last_packet)
+        self._subscribers.add(subscriber)
+        sender = asyncio.ensure_future(subscriber.send_packets())
+        try:
+            await self._read_commands(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            sender.cancel()
+            writer.close()
+
+    async def _read_commands(self, reader):
+        while True:
+            kind, index, style_version, size = unpack_header(
+                await reader.readexactly(HEADER.size))
+            payload = await reader.readexactly(size)
+            if kind != COMMAND:
+                continue
+            command, payload = unpack_command(payload)
+            if command in COMMANDS:
+                self.simulation.send(command, payload)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Run one simulation and stream it to viewers')
+    parser.add_argument('--address', default='127.0.0.1:8765',
+                        help='host:port or unix:/path/to/socket')
+    parser.add_argument('--method', default='auto')
+    parser.add_argument('--no-delta', action='store_true',
+                        help='always send full frames instead of deltas')
+    parser.add_argument('--queue', type=int, default=CLIENT_QUEUE_SIZE,
+                        help='frames buffered per viewer before old ones are dropped')
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    server = SimulationServer(args.method, args.address, not args.no_delta, args.queue)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
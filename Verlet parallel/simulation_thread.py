@@ -0,0 +1,199 @@
+import queue
+import threading
+import numpy as np
+from time import time, sleep
+from collections import deque
+
+from simulator import Simulator
+from budget import FrameBudgetController
+from counters import RollingCounter, RateCounter
+
+
+class Frame:
+    def __init__(self, index, positions, sizes, colors, style_version=0, indices=None,
+                 max_coord=0.0, is_solar_mode=False):
+        self.index = index
+        self.indices = indices
+        self.positions = positions
+        self.sizes = sizes
+        self.colors = colors
+        self.style_version = style_version
+        self.max_coord = max_coord
+        self.is_solar_mode = is_solar_mode
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class FrameBuffer:
+    def __init__(self, capacity=4):
+        self._frames = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def put(self, frame):
+        with self._lock:
+            self._frames.append(frame)
+
+    def latest(self):
+        with self._lock:
+            if not self._frames:
+                return None
+            frame = self._frames.pop()
+            self._frames.clear()
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+
+class SimulationThread(threading.Thread):
+    def __init__(self, method_name, delta_t=1, steps_per_second=10,
+                 buffer_size=4, capacity=4096, adaptive=True):
+        super().__init__(daemon=True)
+        self.frames = FrameBuffer(buffer_size)
+        self._commands = queue.Queue()
+        self._simulator = Simulator(method_name, delta_t=delta_t, capacity=capacity)
+        self._arena = self._simulator.arena
+        self._indices = self._arena.indices()
+        self._sizes = np.zeros(0)
+        self._colors = np.zeros((0, 3))
+        self._max_coord = 0.0
+        self._is_solar_mode = False
+        self._view_version = 0
+        self._style_key = None
+        self._style_version = 0
+        self._step_interval = 1 / steps_per_second
+        self._adaptive = adaptive
+        self.budget = FrameBudgetController(method_name, self._step_interval)
+        self.step_time = RollingCounter()
+        self.particle_steps = RateCounter()
+        self._frame_index = 0
+        self._is_running = False
+        self._is_alive = True
+
+    def send(self, command, payload=None):
+        self._commands.put((command, payload))
+
+    def start_simulation(self):
+        self.send('start')
+
+    def stop_simulation(self):
+        self.send('stop')
+
+    def clear(self):
+        self.send('clear')
+
+    def set_particles(self, particles):
+        self.send('set', list(particles))
+
+    def add_particle(self, particle):
+        self.send('add', particle)
+
+    def set_method(self, method_name):
+        self.send('method', method_name)
+
+    def set_delta_t(self, delta_t):
+        self.send('delta_t', delta_t)
+
+    def set_view(self, max_coord, is_solar_mode):
+        self.send('view', {'max_coord': float(max_coord), 'is_solar_mode': bool(is_solar_mode)})
+
+    def shutdown(self):
+        self.send('quit')
+        self.join()
+
+    def run(self):
+        while self._is_alive:
+            self._handle_commands(block=not self._is_running)
+            if not self._is_running:
+                continue
+
+            start_time = time()
+            self._step()
+            elapsed = time() - start_time
+            if elapsed < self._step_interval:
+                sleep(self._step_interval - elapsed)
+
+    def _handle_commands(self, block):
+        try:
+            command, payload = self._commands.get(block=block)
+        except queue.Empty:
+            return
+        while True:
+            getattr(self, f'_on_{command}')(payload)
+            try:
+                command, payload = self._commands.get_nowait()
+            except queue.Empty:
+                return
+
+    def _on_start(self, payload):
+        self._is_running = len(self._arena) > 0
+
+    def _on_stop(self, payload):
+        self._is_running = False
+
+    def _on_clear(self, payload):
+        self._simulator.clear()
+        self._is_running = False
+        self.frames.clear()
+        self._publish()
+
+    def _on_set(self, payload):
+        self._simulator.clear()
+        self._simulator.add_particles(payload)
+        self._publish()
+
+    def _on_add(self, payload):
+        self._simulator.add_particle(payload)
+        self._publish()
+
+    def _on_method(self, payload):
+        self.budget.set_method(payload)
+
+    def _on_delta_t(self, payload):
+        self._simulator.delta_t = payload
+
+    def _on_view(self, payload):
+        self._max_coord = payload['max_coord']
+        self._is_solar_mode = payload['is_solar_mode']
+        self._view_version += 1
+        self._publish()
+
+    def _on_quit(self, payload):
+        self._is_running = False
+        self._is_alive = False
+
+    def _step(self):
+        particles_count = len(self._arena)
+        substeps = self.budget.substeps
+        if self.budget.current_method() != self._simulator.method_name:
+            self._simulator.set_method(self.budget.current_method())
+        start_time = time()
+        self._simulator.step(1, substeps)
+        elapsed = time() - start_time
+        self.step_time.add(elapsed)
+        self.particle_steps.add(particles_count * substeps)
+        if self._adaptive:
+            self.budget.record(elapsed)
+        if not len(self._arena):
+            self._is_running = False
+        self._publish()
+
+    def _update_style(self):
+        self._indices = self._arena.indices()
+        self._sizes = self._arena.sizes[self._indices]
+        self._colors = self._arena.colors[self._indices]
+        self._style_key = (self._arena.version, self._view_version)
+        self._style_version += 1
+
+    def _publish(self):
+        self._simulator.sync()
+        if self._style_key != (self._arena.version, self._view_version):
+            self._update_style()
+        positions = self._arena.data[self._indices, :2]
+        frame = Frame(self._frame_index, positions, self._sizes,
+                      self._colors, self._style_version, self._indices,
+                      self._max_coord, self._is_solar_mode)
+        self.frames.put(frame)
+        self._frame_index += 1
@@ -0,0 +1,183 @@
+from arena import ParticleArena
+from autotune import select_method
+from backends import get_backend
+from gravity_simulation import NumpyVerlet
+
+MAX_CHUNK = 256
+
+
+class MethodStepper:
+    def __init__(self, method):
+        self._method = method
+        self._data = None
+
+    def load(self, data, delta_t):
+        self._data = data
+
+    def advance(self, delta_t, steps):
+        data = self._data
+        while steps:
+            count = min(steps, MAX_CHUNK)
+            data[:, :4] = self._method(data, (count + 1) * delta_t, count + 1)[-1, :, :4]
+            steps -= count
+
+    def read(self, data):
+        if data is not self._data:
+            data[:, :4] = self._data[:, :4]
+        return data
+
+
+class NumpyStepper:
+    def __init__(self, **options):
+        self._options = options
+        self._verlet = None
+
+    def load(self, data, delta_t):
+        self._verlet = NumpyVerlet(data, **self._options)
+
+    def advance(self, delta_t, steps):
+        self._verlet.advance(delta_t, steps)
+
+    def read(self, data):
+        return self._verlet.read(data)
+
+
+class AutoStepper:
+    def __init__(self, **options):
+        self._options = options
+        self._stepper = None
+        self.method_name = None
+
+    def load(self, data, delta_t):
+        method_name, options = select_method(len(data), delta_t, self._options.get('force_law'))
+        if method_name != self.method_name:
+            self._stepper = create_stepper(method_name, **self._options, **options)
+            self.method_name = method_name
+        self._stepper.load(data, delta_t)
+
+    def advance(self, delta_t, steps):
+        self._stepper.advance(delta_t, steps)
+
+    def read(self, data):
+        return self._stepper.read(data)
+
+
+def create_stepper(method_name, **options):
+    backend = get_backend(method_name, options.get('force_law'))
+    options = {key: value for key, value in options.items()
+               if key in backend.options and value is not None}
+    if backend.name == 'verlet_numpy':
+        return NumpyStepper(**options)
+    if backend.name == 'auto':
+        return AutoStepper(**options)
+    return MethodStepper(backend.bind(**options))
+
+
+class Simulator:
+    def __init__(self, method_name='verlet_numpy', particles=(), delta_t=1,
+                 capacity=4096, lifetimes=True, **options):
+        self.arena = ParticleArena(capacity)
+        self.delta_t = delta_t
+        self.lifetimes = lifetimes
+        self.time = 0.0
+        self.steps = 0
+        self.method_name = None
+        self._stepper = None
+        self._rows = None
+        self._resident = None
+        self._version = None
+        self._is_dirty = False
+        self.set_method(method_name, **options)
+        self.add_particles(particles)
+
+    def __len__(self):
+        return len(self.arena)
+
+    def set_method(self, method_name, **options):
+        stepper = create_stepper(method_name, **options)
+        self.sync()
+        self._stepper = stepper
+        self._version = None
+        self.method_name = method_name
+
+    def add_particle(self, particle):
+        self.sync()
+        return self.arena.emit_particle(particle)
+
+    def add_particles(self, particles):
+        self.sync()
+        return [self.arena.emit_particle(particle) for particle in particles]
+
+    def remove_particle(self, index):
+        self.sync()
+        self.arena.release(index)
+
+    def clear(self):
+        self.arena.clear()
+        self._is_dirty = False
+        self._version = None
+        self._rows = self._resident = None
+
+    def indices(self):
+        return self.arena.indices()
+
+    def snapshot(self):
+        self.sync()
+        return self.arena.data[self.arena.indices()].copy()
+
+    def sync(self):
+        if not self._is_dirty:
+            return
+        self._stepper.read(self._resident)
+        if not isinstance(self._rows, slice):
+            self.arena.data[self._rows, :4] = self._resident[:, :4]
+        self._is_dirty = False
+
+    def step(self, count=1, substeps=1):
+        while count:
+            if self.lifetimes:
+                self._expire()
+            indices = self.arena.indices()
+            if not len(indices):
+                break
+
+            steps = count
+            if self.lifetimes:
+                steps = min(steps, int(self.arena.life_time[indices].min()))
+                self.arena.life_time[indices] -= steps
+            self._advance(indices, steps, substeps)
+            self.time += steps * self.delta_t
+            self.steps += steps
+            count -= steps
+        return self
+
+    def _expire(self):
+        indices = self.arena.indices()
+        if len(indices) and self.arena.life_time[indices].min() <= 0:
+            self.sync()
+            self.arena.expire()
+
+    def _advance(self, indices, steps, substeps):
+        arena = self.arena
+        if len(indices) == 1:
+            self.sync()
+            arena.data[indices, :2] += steps * arena.data[indices, 2:4]
+            self._version = None
+            return
+
+        delta_t = self.delta_t / substeps
+        if self._version != arena.version:
+            self._load(indices, delta_t)
+        self._stepper.advance(delta_t, steps * substeps)
+        self._is_dirty = True
+
+    def _load(self, indices, delta_t):
+        start, stop = indices[0], indices[-1] + 1
+        if stop - start == len(indices):
+            self._rows = slice(start, stop)
+            self._resident = self.arena.data[self._rows]
+        else:
+            self._rows = indices
+            self._resident = self.arena.data[indices]
+        self._stepper.load(self._resident, delta_t)
+        self._version = self.arena.version
@@ -0,0 +1,104 @@
+import sys
+import threading
+import tracemalloc
+import numpy as np
+import pytest
+
+from emitter import Emitter
+from backends import available_backends
+from gravity_simulation import _convert_object_to_array
+
+PARTICLES_COUNT = 200
+TICK_COUNTS = (20, 80)
+BYTES_PER_TICK = 1024
+BLOCKS_PER_TICK = 0.1
+FORCE_FUNCTIONS = ('_calculate_acceleration', '_calculate_accelerations',
+                   '_calculate_neighbour_accelerations')
+VERLET_BACKENDS = [backend for backend in available_backends()
+                   if backend.name.startswith('verlet')]
+
+
+class AllocationTracer:
+    def __init__(self, min_size, output_size):
+        self.min_size = min_size
+        self.output_size = output_size
+        self.bytes = 0
+        self.blocks = 0
+        self._output_seen = False
+        self._force_frames = set()
+        self._lock = threading.Lock()
+        self._start = 0
+
+    def __enter__(self):
+        tracemalloc.start()
+        self._restart()
+        threading.settrace(self._trace)
+        sys.settrace(self._trace)
+        return self
+
+    def __exit__(self, *args):
+        sys.settrace(None)
+        threading.settrace(None)
+        self._measure()
+        tracemalloc.stop()
+
+    def _trace(self, frame, event, arg):
+        with self._lock:
+            if event == 'call' and frame.f_code.co_name in FORCE_FUNCTIONS:
+                if not self._force_frames:
+                    self._measure()
+                self._force_frames.add(frame)
+            elif self._force_frames:
+                if event == 'return' and frame in self._force_frames:
+                    self._force_frames.discard(frame)
+                    if not self._force_frames:
+                        self._restart()
+            else:
+                self._measure()
+        return self._trace
+
+    def _measure(self):
+        current, peak = tracemalloc.get_traced_memory()
+        growth = peak - self._start
+        if growth >= self.output_size and not self._output_seen:
+            growth -= self.output_size
+            self._output_seen = True
+        if growth >= self.min_size:
+            self.bytes += growth
+            self.blocks += 1
+        self._restart(current)
+
+    def _restart(self, current=None):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0] if current is None else current
+
+
+def measure_allocations(method, data, tick_count):
+    tracer = AllocationTracer(len(data) * np.dtype(np.float64).itemsize,
+                              tick_count * data.nbytes)
+    with tracer:
+        method(data, tick_count, tick_count)
+    return tracer.bytes, tracer.blocks
+
+
+@pytest.fixture(scope='module')
+def data():
+    state = np.random.get_state()
+    np.random.seed(0)
+    particles = Emitter().generate_particles(PARTICLES_COUNT)
+    np.random.set_state(state)
+    return _convert_object_to_array(particles)
+
+
+# Multiprocessing workers tick in child processes and compiled backends tick in
+# native loops, so for those only the host side of each call is traced here.
+@pytest.mark.parametrize('backend', VERLET_BACKENDS, ids=lambda backend: backend.name)
+def test_step_allocations(backend, data):
+    method = backend.bind(threads_count=2)
+    method(data, TICK_COUNTS[0], TICK_COUNTS[0])
+    first, last = [measure_allocations(method, data, tick_count) for tick_count in TICK_COUNTS]
+    ticks = TICK_COUNTS[1] - TICK_COUNTS[0]
+    bytes_per_tick = (last[0] - first[0]) / ticks
+    blocks_per_tick = (last[1] - first[1]) / ticks
+    assert bytes_per_tick <= BYTES_PER_TICK
+    assert blocks_per_tick <= BLOCKS_PER_TICK
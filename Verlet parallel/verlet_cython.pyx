@@ -1,27 +1,66 @@
 import numpy as np
-from copy import deepcopy
 cimport numpy as np
+from libc.math cimport sqrt, sqrtf
+
+from forces import GRAVITY
 DTYPE = np.double
 ctypedef np.double_t DTYPE_t
+SINGLE = np.float32
+ctypedef np.float32_t SINGLE_t
 
 
 def calculate_verlet_cython(np.ndarray[DTYPE_t, ndim=2] data,
-                            double max_time, int tick_count):
+                            double max_time, int tick_count, precision='double',
+                            force_law=GRAVITY):
+    law = force_law.kernel_parameters()
+    if precision == 'single':
+        return _calculate_verlet_single(data, max_time, tick_count, law)
+
     cdef double delta_t = max_time / tick_count
     cdef int N = len(data)
     cdef int M = tick_count
-    cdef DTYPE_t[:, :] prev_data = deepcopy(data)
+    cdef int code = law[0]
+    cdef double law_a = law[1], law_b = law[2], law_cutoff2 = law[3]
     cdef DTYPE_t[:, :] prev_accs = np.zeros((N, 2), dtype=DTYPE)
-    cdef DTYPE_t[:, :, :] result = np.zeros((M, N, len(data[0])), dtype=DTYPE)
-    _copy_data(data, result, 0)
-    cdef int i
+    cdef DTYPE_t[:, :] acc = np.zeros((1, 2), dtype=DTYPE)
+    result_array = np.empty((M, N, len(data[0])), dtype=DTYPE)
+    result_array[0] = data
+    cdef DTYPE_t[:, :, :] result = result_array
+    cdef DTYPE_t[:, :] prev_data, cur_data
+    cdef int i, j, k
 
     for i in range(1, M):
-        prev_data = deepcopy(data)
-        _update_coordinates(data, prev_data, prev_accs, delta_t)
-        _update_speed(data, prev_accs, delta_t)
-        _copy_data(data, result, i)
-    return result
+        prev_data = result[i - 1]
+        cur_data = result[i]
+        cur_data[:, :] = prev_data
+        for j in range(N):
+            _calculate_acceleration(prev_data, j, code, law_a, law_b, law_cutoff2, acc)
+            for k in range(2):
+                prev_accs[j, k] = acc[0, k]
+                cur_data[j, k] += (prev_data[j, k + 2] * delta_t
+                                   + 0.5 * prev_accs[j, k] * delta_t * delta_t)
+        for j in range(N):
+            _calculate_acceleration(cur_data, j, code, law_a, law_b, law_cutoff2, acc)
+            for k in range(2):
+                cur_data[j, k + 2] += 0.5 * (prev_accs[j, k] + acc[0, k]) * delta_t
+    return result_array
+
+
+cdef void _calculate_acceleration(DTYPE_t[:, :] data, int index, int code, double law_a,
+                                  double law_b, double law_cutoff2, DTYPE_t[:, :] acc):
+    cdef double factor, dx, dy
+    cdef int i
+
+    acc[0, 0] = 0
+    acc[0, 1] = 0
+    for i in range(data.shape[0]):
+        if i != index:
+            dx = data[i, 0] - data[index, 0]
+            dy = data[i, 1] - data[index, 1]
+            factor = _pair_factor(code, law_a, law_b, law_cutoff2, dx * dx + dy * dy,
+                                  data[index, 5], data[i, 5], data[index, 4], data[i, 4])
+            acc[0, 0] += factor * dx
+            acc[0, 1] += factor * dy
 
 
 def _copy_data(DTYPE_t[:, :] data, DTYPE_t[:, :, :] result, int index):
@@ -31,45 +70,129 @@ def _copy_data(DTYPE_t[:, :] data, DTYPE_t[:, :, :] result, int index):
             result[index, i, j] = data[i, j]
 
 
-def _calculate_acceleration(DTYPE_t[:, :] data, int index):
-    cdef double G = 6.6743015e-11
-    cdef DTYPE_t[:] a = np.zeros((2,), dtype=DTYPE)
-    cdef int i, k
+cdef double _pair_factor(int code, double law_a, double law_b, double law_cutoff2,
+                         double dist2, double mass_i, double mass_j,
+                         double radius_i, double radius_j):
+    cdef double norm, ratio6, overlap
+    if code == 0:
+        dist2 += law_b
+        return law_a * mass_j / dist2 / sqrt(dist2)
+    if code == 1:
+        if dist2 >= law_cutoff2:
+            return 0
+        ratio6 = (law_b / dist2) ** 3
+        return -24 * law_a * (2 * ratio6 * ratio6 - ratio6) / (dist2 * mass_i)
+    norm = sqrt(dist2)
+    overlap = radius_i + radius_j - norm
+    if overlap <= 0:
+        return 0
+    return -law_a * overlap / (norm * mass_i)
+
+
+cdef float _pair_factor_single(int code, float law_a, float law_b, float law_cutoff2,
+                               float dist2, float mass_i, float mass_j,
+                               float radius_i, float radius_j):
+    cdef float norm, ratio6, overlap
+    if code == 0:
+        dist2 += law_b
+        return law_a * mass_j / dist2 / sqrtf(dist2)
+    if code == 1:
+        if dist2 >= law_cutoff2:
+            return 0
+        ratio6 = law_b / dist2
+        ratio6 = ratio6 * ratio6 * ratio6
+        return -24 * law_a * (2 * ratio6 * ratio6 - ratio6) / (dist2 * mass_i)
+    norm = sqrtf(dist2)
+    overlap = radius_i + radius_j - norm
+    if overlap <= 0:
+        return 0
+    return -law_a * overlap / (norm * mass_i)
+
+
+def _calculate_verlet_single(np.ndarray[DTYPE_t, ndim=2] data,
+                             double max_time, int tick_count, law):
+    cdef float delta_t = max_time / tick_count
+    cdef int N = len(data)
+    cdef int M = tick_count
+    cdef int i, j, k
+    origin = data[:, :2].mean(axis=0)
+    cdef SINGLE_t[:, :] positions = (data[:, :2] - origin).astype(SINGLE)
+    cdef SINGLE_t[:, :] speeds = data[:, 2:4].astype(SINGLE)
+    cdef SINGLE_t[:, :] positions_error = np.zeros((N, 2), dtype=SINGLE)
+    cdef SINGLE_t[:, :] speeds_error = np.zeros((N, 2), dtype=SINGLE)
+    cdef SINGLE_t[:, :] prev_accs = np.zeros((N, 2), dtype=SINGLE)
+    cdef SINGLE_t[:, :] cur_accs = np.zeros((N, 2), dtype=SINGLE)
+    cdef SINGLE_t[:] masses = data[:, 5].astype(SINGLE)
+    cdef SINGLE_t[:] radii = data[:, 4].astype(SINGLE)
+    cdef int code = law[0]
+    cdef float law_a = law[1], law_b = law[2], law_cutoff2 = law[3]
+    cdef DTYPE_t[:, :, :] result = np.zeros((M, N, len(data[0])), dtype=DTYPE)
+    cdef double origin_x = origin[0], origin_y = origin[1]
+    _copy_data(data, result, 0)
 
-    for i in range(len(data)):
-        if i != index:
+    _calculate_accelerations_single(positions, masses, radii, code, law_a, law_b, law_cutoff2,
+                                    prev_accs)
+    for i in range(1, M):
+        for j in range(N):
             for k in range(2):
-                a[k] += (G * data[i, 5] * (data[i, k] - data[index, k])
-                         / _calculate_norm(data, i, index) ** 3)
-    return a
-
-
-def _calculate_norm(DTYPE_t[:, :] data, int i, int j):
-    cdef int k
-    cdef double temp = 0
-    for k in range(2):
-        temp += (data[i, k] - data[j, k]) ** 2
-    return temp ** 0.5
-
-
-def _update_coordinates(DTYPE_t[:, :] data, DTYPE_t[:, :] prev_data,
-                        DTYPE_t[:, :] prev_accs, double delta_t):
-    cdef DTYPE_t[:] temp_acc = np.zeros((2,), dtype=DTYPE)
-    cdef int i, k
-
-    for i in range(len(data)):
-        temp_acc = _calculate_acceleration(prev_data, i)
-        for k in range(2):
-            prev_accs[i, k] = temp_acc[k]
-            data[i, k] += (prev_data[i, k + 2] * delta_t
-                           + 0.5 * prev_accs[i, k] * delta_t ** 2)
-
-
-def _update_speed(DTYPE_t[:, :] data, DTYPE_t[:, :] prev_accs, double delta_t):
-    cdef DTYPE_t[:] cur_acc = np.zeros((2,), dtype=DTYPE)
-    cdef int i, k
-
-    for i in range(len(data)):
-        cur_acc = _calculate_acceleration(data, i)
-        for k in range(2):
-            data[i, k + 2] += 0.5 * (prev_accs[i, k] + cur_acc[k]) * delta_t
+                _compensated_add(positions, positions_error, j, k,
+                                 speeds[j, k] * delta_t
+                                 + 0.5 * prev_accs[j, k] * delta_t * delta_t)
+        _calculate_accelerations_single(positions, masses, radii, code, law_a, law_b,
+                                        law_cutoff2, cur_accs)
+        for j in range(N):
+            for k in range(2):
+                _compensated_add(speeds, speeds_error, j, k,
+                                 0.5 * (prev_accs[j, k] + cur_accs[j, k]) * delta_t)
+                prev_accs[j, k] = cur_accs[j, k]
+            result[i, j, 0] = <double> positions[j, 0] - <double> positions_error[j, 0] + origin_x
+            result[i, j, 1] = <double> positions[j, 1] - <double> positions_error[j, 1] + origin_y
+            result[i, j, 2] = <double> speeds[j, 0] - <double> speeds_error[j, 0]
+            result[i, j, 3] = <double> speeds[j, 1] - <double> speeds_error[j, 1]
+            result[i, j, 4] = data[j, 4]
+            result[i, j, 5] = data[j, 5]
+    return np.asarray(result)
+
+
+cdef void _calculate_accelerations_single(SINGLE_t[:, :] positions, SINGLE_t[:] masses,
+                                          SINGLE_t[:] radii, int code, float law_a,
+                                          float law_b, float law_cutoff2,
+                                          SINGLE_t[:, :] accs):
+    cdef int N = positions.shape[0]
+    cdef int i, j
+    cdef float dx, dy, dist2, factor
+    cdef float sum_x, sum_y, error_x, error_y, term, total
+
+    for i in range(N):
+        sum_x = 0
+        sum_y = 0
+        error_x = 0
+        error_y = 0
+        for j in range(N):
+            if j == i:
+                continue
+            dx = positions[j, 0] - positions[i, 0]
+            dy = positions[j, 1] - positions[i, 1]
+            dist2 = dx * dx + dy * dy
+            factor = _pair_factor_single(code, law_a, law_b, law_cutoff2, dist2,
+                                         masses[i], masses[j], radii[i], radii[j])
+
+            term = factor * dx - error_x
+            total = sum_x + term
+            error_x = (total - sum_x) - term
+            sum_x = total
+
+            term = factor * dy - error_y
+            total = sum_y + term
+            error_y = (total - sum_y) - term
+            sum_y = total
+        accs[i, 0] = sum_x
+        accs[i, 1] = sum_y
+
+
+cdef inline void _compensated_add(SINGLE_t[:, :] values, SINGLE_t[:, :] errors,
+                                  int i, int k, float increment):
+    cdef float term = increment - errors[i, k]
+    cdef float total = values[i, k] + term
+    errors[i, k] = (total - values[i, k]) - term
+    values[i, k] = total